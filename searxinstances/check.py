@@ -2,7 +2,7 @@ import sys
 import tempfile
 import subprocess
 
-from . import model
+from . import model, publicsuffix
 
 
 def run_instance_diff(content_after: str):
@@ -19,12 +19,18 @@ def check():
         content = input_file.read()
     instance_list = model.yaml_load(content)
     content_after = model.yaml_dump(instance_list)
-    if content == content_after:
-        print('OK')
-    else:
+    if content != content_after:
         print('ERROR: The file is not normalized')
         run_instance_diff(content_after.encode('utf-8'))
         sys.exit(1)
+    shared_domain_errors = publicsuffix.get_shared_domain_errors(instance_list)
+    if len(shared_domain_errors) > 0:
+        for error in shared_domain_errors:
+            print('ERROR:', error)
+        sys.exit(1)
+    for registrable_domain, url_list in publicsuffix.get_same_owner_clusters(instance_list).items():
+        print(f'INFO: {registrable_domain} has {len(url_list)} instances: {", ".join(url_list)}')
+    print('OK')
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+"""Export the instance list to an indexed SQLite database
+
+    searxinstances export --sqlite instances.db
+
+Each instance row stores a hash of the entry: when the database already
+exists, only the entries added, changed or removed since the previous export
+are written. Readers can open the database read-only, for example with
+`sqlite3.connect('file:instances.db?mode=ro', uri=True)` and `PRAGMA mmap_size`.
+"""
+import argparse
+import hashlib
+import sqlite3
+
+import rfc3986
+
+from . import model
+
+
+SCHEMA = '''
+PRAGMA foreign_keys = ON;
+CREATE TABLE IF NOT EXISTS instances (
+    url TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    tld TEXT NOT NULL,
+    network TEXT NOT NULL,
+    analytics INTEGER NOT NULL,
+    git_url TEXT,
+    hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS additional_urls (
+    url TEXT PRIMARY KEY,
+    instance_url TEXT NOT NULL REFERENCES instances(url) ON DELETE CASCADE,
+    label TEXT,
+    host TEXT NOT NULL,
+    tld TEXT NOT NULL,
+    network TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS comments (
+    instance_url TEXT NOT NULL REFERENCES instances(url) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    comment TEXT NOT NULL,
+    PRIMARY KEY (instance_url, position)
+);
+CREATE INDEX IF NOT EXISTS instances_host ON instances(host);
+CREATE INDEX IF NOT EXISTS instances_tld ON instances(tld);
+CREATE INDEX IF NOT EXISTS instances_network ON instances(network);
+CREATE INDEX IF NOT EXISTS additional_urls_instance_url ON additional_urls(instance_url);
+CREATE INDEX IF NOT EXISTS additional_urls_host ON additional_urls(host);
+CREATE INDEX IF NOT EXISTS additional_urls_network ON additional_urls(network);
+'''
+
+
+def get_url_columns(url: str):
+    """Return (host, tld, network) of url, network is "tor", "i2p" or "normal" like on searx.space"""
+    host = rfc3986.urlparse(url).host
+    tld = host.rsplit('.', 1)[-1]
+    network = {'onion': 'tor', 'i2p': 'i2p'}.get(tld, 'normal')
+    return host, tld, network
+
+
+def get_entry_hash(instance: model.Instance) -> str:
+    return hashlib.sha1(instance.json_dump().encode('utf-8')).hexdigest()
+
+
+def insert_instance(connection: sqlite3.Connection, url: str, instance: model.Instance, entry_hash: str):
+    connection.execute(
+        'INSERT INTO instances(url, host, tld, network, analytics, git_url, hash) VALUES (?, ?, ?, ?, ?, ?, ?)',
+        (url, *get_url_columns(url), bool(instance.analytics), instance.git_url, entry_hash)
+    )
+    connection.executemany(
+        'INSERT INTO additional_urls(url, instance_url, label, host, tld, network) VALUES (?, ?, ?, ?, ?, ?)',
+        [
+            (additional_url, url, label, *get_url_columns(additional_url))
+            for additional_url, label in instance.additional_urls.items()
+        ]
+    )
+    connection.executemany(
+        'INSERT INTO comments(instance_url, position, comment) VALUES (?, ?, ?)',
+        [(url, position, str(comment)) for position, comment in enumerate(instance.comments)]
+    )
+
+
+def export_sqlite(instance_list: model.InstanceList, filename: str):
+    """Update the database, return (number of written entries, number of removed entries)"""
+    connection = sqlite3.connect(filename)
+    try:
+        connection.executescript(SCHEMA)
+        with connection:
+            existing_hashes = dict(connection.execute('SELECT url, hash FROM instances'))
+            entry_hashes = {url: get_entry_hash(instance) for url, instance in instance_list.items()}
+            # delete the changed entries first: an additional URL may move from an instance to another one
+            connection.executemany('DELETE FROM instances WHERE url = ?', [
+                (url,) for url, entry_hash in existing_hashes.items() if entry_hashes.get(url) != entry_hash
+            ])
+            written = 0
+            for url, instance in instance_list.items():
+                if existing_hashes.get(url) != entry_hashes[url]:
+                    insert_instance(connection, url, instance, entry_hashes[url])
+                    written += 1
+        return written, len(existing_hashes.keys() - entry_hashes.keys())
+    finally:
+        connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances export',
+                                     description='Export the instance list.')
+    parser.add_argument('--sqlite', required=True, metavar='FILENAME', help='SQLite database to create or update')
+    args = parser.parse_args(argv)
+
+    written, removed = export_sqlite(model.load(), args.sqlite)
+    print(f'{args.sqlite}: {written} written, {removed} removed')
+
+
+if __name__ == "__main__":
+    main()
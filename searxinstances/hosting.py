@@ -0,0 +1,147 @@
+"""Find the instances behind a forbidden TLS terminator
+
+Only the published networks of the Cloudflare proxy and of the Fastly CDN are
+listed in hosting_networks.txt: the other CDN, PaaS and managed load balancers
+are not detected until their networks are added to the file.
+
+The hosts are resolved concurrently, and each address is looked up in a
+binary prefix tree built from hosting_networks.txt: one step per bit of
+the address, whatever the number of networks.
+"""
+from os.path import realpath, dirname
+import argparse
+import asyncio
+import ipaddress
+import socket
+import sys
+
+import rfc3986
+
+from . import model
+
+
+FILENAME = realpath(dirname(realpath(__file__))) + '/hosting_networks.txt'
+
+
+class PrefixTree:
+
+    __slots__ = ['roots']
+
+    def __init__(self):
+        # one binary tree per IP version, a node is [child 0, child 1, value]
+        self.roots = {4: [None, None, None], 6: [None, None, None]}
+
+    def add(self, network: str, value):
+        network = ipaddress.ip_network(network)
+        node = self.roots[network.version]
+        address = int(network.network_address)
+        for index in range(network.max_prefixlen - 1, network.max_prefixlen - network.prefixlen - 1, -1):
+            bit = (address >> index) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        node[2] = value
+
+    def get(self, address: str):
+        """Return the value of the longest network containing address, None if there is none"""
+        address = ipaddress.ip_address(address)
+        node = self.roots[address.version]
+        address_int = int(address)
+        value = node[2]
+        for index in range(address.max_prefixlen - 1, -1, -1):
+            node = node[(address_int >> index) & 1]
+            if node is None:
+                break
+            if node[2] is not None:
+                value = node[2]
+        return value
+
+
+class HostingResult:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['url', 'host', 'addresses', 'providers', 'error']
+
+    def __init__(self, url: str, host: str, addresses=None, providers=None, error=None):
+        self.url = url
+        self.host = host
+        self.addresses = addresses or []
+        self.providers = providers or {}
+        self.error = error
+
+    def __repr__(self):
+        return f'HostingResult({self.url!r}, providers={self.providers!r}, error={self.error!r})'
+
+
+def load_prefix_tree(filename: str = FILENAME) -> PrefixTree:
+    prefix_tree = PrefixTree()
+    with open(filename, 'r', encoding='utf-8') as input_file:
+        for line in input_file:
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            provider, network = line.split()
+            prefix_tree.add(network, provider)
+    return prefix_tree
+
+
+async def resolve(host: str) -> list:
+    loop = asyncio.get_running_loop()
+    addrinfo_list = await loop.getaddrinfo(host, 443, type=socket.SOCK_STREAM)
+    return sorted(set(addrinfo[4][0] for addrinfo in addrinfo_list))
+
+
+async def check_url(url: str, prefix_tree: PrefixTree, resolver, semaphore: asyncio.Semaphore) -> HostingResult:
+    host = rfc3986.urlparse(url).host
+    async with semaphore:
+        try:
+            addresses = await resolver(host)
+        except (OSError, UnicodeError) as ex:
+            return HostingResult(url, host, error=str(ex))
+    providers = {}
+    for address in addresses:
+        provider = prefix_tree.get(address)
+        if provider is not None:
+            providers[address] = provider
+    return HostingResult(url, host, addresses, providers)
+
+
+async def check_instance_list(instance_list: model.InstanceList, prefix_tree: PrefixTree = None,
+                              resolver=resolve, concurrency: int = 32) -> list:
+    """Resolve the clearnet URLs of instance_list, the .onion and .i2p hosts are ignored
+
+    resolver is a coroutine function which returns the IP addresses of a host.
+    """
+    if prefix_tree is None:
+        prefix_tree = load_prefix_tree()
+    semaphore = asyncio.Semaphore(concurrency)
+    url_list = [
+        instance_url
+        for url, instance in instance_list.items()
+        for instance_url in instance.get_urls(url)
+        if not model.host_use_http(rfc3986.urlparse(instance_url).host)
+    ]
+    return await asyncio.gather(*[check_url(url, prefix_tree, resolver, semaphore) for url in url_list])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances hosting',
+                                     description='Find the instances behind a forbidden TLS terminator.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Number of concurrent DNS requests')
+    args = parser.parse_args(argv)
+
+    result_list = asyncio.run(check_instance_list(model.load(), concurrency=args.concurrency))
+    found = False
+    for result in result_list:
+        if result.error is not None:
+            print(f'WARNING: {result.url}: {result.error}')
+        elif len(result.providers) > 0:
+            found = True
+            providers = ', '.join(f'{address} ({provider})' for address, provider in result.providers.items())
+            print(f'ERROR: {result.url}: {providers}')
+    if found:
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == "__main__":
+    main()
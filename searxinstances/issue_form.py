@@ -0,0 +1,127 @@
+"""Parse the body of the issues created with .github/ISSUE_TEMPLATE/add-instance.yaml
+
+GitHub renders an issue form as markdown: one `### <label>` heading per field,
+followed by the value, `_No response_` for an empty field, or a `- [X] <label>`
+line per checkbox. The body is read once, line by line.
+
+Usage from a workflow:
+
+    printf '%s' "$ISSUE_BODY" | python -m searxinstances.issue_form --field matrix_username
+"""
+import argparse
+import json
+import sys
+from collections import OrderedDict
+
+
+NO_RESPONSE = '_No response_'
+# heading of the field in add-instance.yaml -> attribute of IssueForm
+FIELDS = {
+    'Matrix username': 'matrix_username',
+    'Alternate source code': 'source_code_url',
+    'Comment': 'comment',
+}
+
+
+class IssueForm:
+
+    __slots__ = ['sections', 'checkboxes', 'matrix_username', 'source_code_url', 'comment']
+
+    def __init__(self):
+        # heading -> text of the section, None for "_No response_"
+        self.sections = OrderedDict()
+        # checkbox label -> checked
+        self.checkboxes = OrderedDict()
+        self.matrix_username = None
+        self.source_code_url = None
+        self.comment = None
+
+    @property
+    def unchecked(self) -> list:
+        return [label for label, checked in self.checkboxes.items() if not checked]
+
+    def to_json(self):
+        return dict([
+            ("sections", self.sections),
+            ("checkboxes", self.checkboxes),
+            ("matrix_username", self.matrix_username),
+            ("source_code_url", self.source_code_url),
+            ("comment", self.comment),
+        ])
+
+    def __repr__(self):
+        return str(self.to_json())
+
+
+def remove_comments(text: str) -> str:
+    """Remove the <!-- --> comments, each comment ends at the first -->"""
+    result = []
+    position = 0
+    while True:
+        start = text.find('<!--', position)
+        if start == -1:
+            break
+        end = text.find('-->', start + 4)
+        if end == -1:
+            # unterminated comment: keep the text
+            break
+        result.append(text[position:start])
+        position = end + 3
+    result.append(text[position:])
+    return ''.join(result)
+
+
+def parse_checkbox(line: str):
+    """Return (label, checked) if the line is a task list item, otherwise None"""
+    if len(line) >= 6 and line[0] in '-*' and line[1] == ' ' and line[2] == '[' and line[4] == ']':
+        if line[3] in 'xX':
+            return line[5:].strip(), True
+        if line[3] == ' ':
+            return line[5:].strip(), False
+    return None
+
+
+def parse(body: str) -> IssueForm:
+    issue_form = IssueForm()
+    heading = None
+    lines = []
+
+    def end_section():
+        if heading is None:
+            return
+        text = '\n'.join(lines).strip()
+        issue_form.sections[heading] = None if text in ('', NO_RESPONSE) else text
+        if heading in FIELDS:
+            setattr(issue_form, FIELDS[heading], issue_form.sections[heading])
+
+    for line in remove_comments(body or '').splitlines():
+        if line.startswith('### '):
+            end_section()
+            heading = line[4:].strip()
+            lines = []
+            continue
+        checkbox = parse_checkbox(line.strip())
+        if heading is not None and checkbox is not None:
+            issue_form.checkboxes[checkbox[0]] = checkbox[1]
+        lines.append(line)
+    end_section()
+    return issue_form
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Parse an add-instance issue body read from stdin.')
+    parser.add_argument('--field', choices=sorted(FIELDS.values()) + ['unchecked'],
+                        help='Print only this field (one line), by default print everything as JSON')
+    args = parser.parse_args(argv)
+
+    issue_form = parse(sys.stdin.read())
+    if args.field is None:
+        print(json.dumps(issue_form.to_json(), indent=2))
+    elif args.field == 'unchecked':
+        print('\n'.join(issue_form.unchecked))
+    else:
+        print(' '.join((getattr(issue_form, args.field) or '').split()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""Local SQLite mirror of the GitHub issues with the "instance" label
+
+The mirror keeps the closed issues too, so re-submissions can be found
+without asking GitHub, and it is updated incrementally with the `since` parameter.
+"""
+import os.path
+import sqlite3
+
+import httpx
+
+
+GITHUB_ISSUES_URL = 'https://api.github.com/repos/searxng/searx-instances/issues'
+INSTANCE_LABEL = 'instance'
+FILENAME = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                        'searxinstances', 'issues.db')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS issues (
+    number INTEGER PRIMARY KEY,
+    title TEXT NOT NULL,
+    body TEXT NOT NULL,
+    state TEXT NOT NULL,
+    user TEXT,
+    html_url TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS issue_labels (
+    number INTEGER NOT NULL REFERENCES issues(number) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    PRIMARY KEY (number, name)
+);
+CREATE INDEX IF NOT EXISTS issues_state ON issues(state);
+CREATE VIRTUAL TABLE IF NOT EXISTS issues_fts USING fts5(title, body);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+'''
+
+
+class IssueMirror:
+
+    def __init__(self, filename: str = FILENAME):
+        if filename != ':memory:':
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+        self.connection = sqlite3.connect(filename)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def since(self):
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'since'").fetchone()
+        return row[0] if row is not None else None
+
+    def sync(self, client: httpx.Client, url: str = GITHUB_ISSUES_URL) -> int:
+        """Fetch the issues updated since the last sync, return the number of fetched issues
+
+        The label filter is applied locally: an issue whose "instance" label
+        has been removed must be removed from the mirror too.
+        """
+        params = {'state': 'all', 'sort': 'updated', 'direction': 'asc', 'per_page': 100}
+        since = self.since
+        if since is not None:
+            params['since'] = since
+        count = 0
+        while url is not None:
+            response = client.get(url, params=params)
+            response.raise_for_status()
+            with self.connection:
+                for issue in response.json():
+                    if 'pull_request' in issue:
+                        continue
+                    self.upsert(issue)
+                    if since is None or issue['updated_at'] > since:
+                        since = issue['updated_at']
+                    count += 1
+                if since is not None:
+                    self.connection.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('since', ?)", (since,))
+            # the next URL already contains the query parameters
+            url = response.links.get('next', {}).get('url')
+            params = None
+        return count
+
+    def upsert(self, issue: dict):
+        number = issue['number']
+        label_names = [label.get('name') for label in issue.get('labels', [])]
+        self.connection.execute('DELETE FROM issues WHERE number = ?', (number,))
+        self.connection.execute('DELETE FROM issues_fts WHERE rowid = ?', (number,))
+        if INSTANCE_LABEL not in label_names:
+            return
+        title = issue.get('title') or ''
+        body = issue.get('body') or ''
+        self.connection.execute(
+            'INSERT INTO issues(number, title, body, state, user, html_url, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (number, title, body, issue.get('state'), (issue.get('user') or {}).get('login'),
+             issue.get('html_url'), issue.get('updated_at'))
+        )
+        self.connection.executemany('INSERT INTO issue_labels(number, name) VALUES (?, ?)',
+                                    [(number, name) for name in set(label_names)])
+        self.connection.execute('INSERT INTO issues_fts(rowid, title, body) VALUES (?, ?, ?)', (number, title, body))
+
+    def get_issue_list(self, state: str = 'open') -> list:
+        """Return the issues in the same format as the GitHub API"""
+        labels = {}
+        for number, name in self.connection.execute('SELECT number, name FROM issue_labels ORDER BY name'):
+            labels.setdefault(number, []).append({'name': name})
+        issue_list = []
+        for number, title, body, issue_state, user, html_url, updated_at in self.connection.execute(
+                'SELECT number, title, body, state, user, html_url, updated_at FROM issues '
+                'WHERE ? IS NULL OR state = ? ORDER BY number DESC', (state, state)):
+            issue_list.append({
+                'number': number,
+                'title': title,
+                'body': body,
+                'state': issue_state,
+                'user': {'login': user},
+                'html_url': html_url,
+                'updated_at': updated_at,
+                'labels': labels.get(number, []),
+            })
+        return issue_list
+
+    def search(self, query: str) -> list:
+        """Full-text search in the titles and the bodies, return the issue numbers
+
+        The query is searched as a phrase, so a host or a URL can be looked up as it is.
+        """
+        phrase = '"' + query.replace('"', '""') + '"'
+        return [
+            row[0] for row in self.connection.execute(
+                'SELECT rowid FROM issues_fts WHERE issues_fts MATCH ? ORDER BY rank', (phrase,)
+            )
+        ]
@@ -0,0 +1,211 @@
+"""Detect the instances answering repeated queries from a cache
+
+searx.space sends the same queries again and again: an instance caching them
+answers much faster for these queries than for new ones. Each instance gets
+a workload alternating a repeated query and unique queries at a fixed rate,
+the response times go to two log-bucketed histograms, and the instance is
+suspicious when the repeated queries are both significantly (Mann-Whitney U
+test) and substantially faster than the unique ones.
+"""
+import argparse
+import asyncio
+import math
+import secrets
+import sys
+import time
+
+import httpx
+
+from . import model
+
+
+# 2^5 sub-buckets per power of two: the relative error of a bucket is less than 1/32
+SUB_BUCKET_BITS = 5
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+
+
+class LogHistogram:
+    """HDR-style histogram of positive integers (response times in microseconds)"""
+
+    __slots__ = ['counts', 'total']
+
+    def __init__(self):
+        self.counts = {}
+        self.total = 0
+
+    @staticmethod
+    def get_index(value: int) -> int:
+        if value < SUB_BUCKET_COUNT:
+            return value
+        shift = value.bit_length() - 1 - SUB_BUCKET_BITS
+        return ((shift + 1) << SUB_BUCKET_BITS) + (value >> shift) - SUB_BUCKET_COUNT
+
+    @staticmethod
+    def get_value(index: int) -> int:
+        """Return the lowest value of the bucket"""
+        if index < SUB_BUCKET_COUNT:
+            return index
+        shift = (index >> SUB_BUCKET_BITS) - 1
+        return ((index & (SUB_BUCKET_COUNT - 1)) + SUB_BUCKET_COUNT) << shift
+
+    def record(self, value: int, count: int = 1):
+        index = self.get_index(max(0, int(value)))
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+
+    def items(self):
+        """Yield (value, count) sorted by value"""
+        for index in sorted(self.counts):
+            yield self.get_value(index), self.counts[index]
+
+    def percentile(self, percent: float):
+        if self.total == 0:
+            return None
+        rank = max(1, math.ceil(self.total * percent / 100))
+        seen = 0
+        for value, count in self.items():
+            seen += count
+            if seen >= rank:
+                return value
+        return None
+
+
+def get_rank_sum(first: LogHistogram, second: LogHistogram):
+    """Return (rank sum of the values of first, sum of t^3 - t over the groups of t ties)"""
+    rank = 0
+    rank_sum_first = 0.0
+    tie_correction = 0
+    for index in sorted(set(first.counts) | set(second.counts)):
+        count_first = first.counts.get(index, 0)
+        count = count_first + second.counts.get(index, 0)
+        # mid rank of the tied values
+        rank_sum_first += count_first * (rank + (count + 1) / 2)
+        rank += count
+        tie_correction += count ** 3 - count
+    return rank_sum_first, tie_correction
+
+
+def mann_whitney_less(first: LogHistogram, second: LogHistogram) -> float:
+    """One-sided p-value of the hypothesis "the values of first are lower than the values of second"
+
+    Uses the normal approximation with the tie correction; values in the same bucket are ties.
+    """
+    n_first, n_second = first.total, second.total
+    if n_first == 0 or n_second == 0:
+        return 1.0
+    rank_sum_first, tie_correction = get_rank_sum(first, second)
+    u_first = rank_sum_first - n_first * (n_first + 1) / 2
+    total = n_first + n_second
+    mean = n_first * n_second / 2
+    variance = n_first * n_second / 12 * ((total + 1) - tie_correction / (total * (total - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u_first - mean + 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+class LatencyResult:
+
+    __slots__ = ['url', 'repeated', 'unique', 'errors', 'p_value', 'ratio']
+
+    def __init__(self, url: str):
+        self.url = url
+        self.repeated = LogHistogram()
+        self.unique = LogHistogram()
+        self.errors = 0
+        self.p_value = None
+        self.ratio = None
+
+    def is_suspicious(self, alpha: float = 0.01, max_ratio: float = 0.5) -> bool:
+        return self.p_value is not None and self.p_value < alpha and self.ratio is not None and self.ratio < max_ratio
+
+    def analyze(self):
+        self.p_value = mann_whitney_less(self.repeated, self.unique)
+        repeated_median, unique_median = self.repeated.percentile(50), self.unique.percentile(50)
+        if repeated_median is not None and unique_median:
+            self.ratio = repeated_median / unique_median
+
+    def __repr__(self):
+        return f'LatencyResult({self.url!r}, p_value={self.p_value!r}, ratio={self.ratio!r})'
+
+
+async def measure(client: httpx.AsyncClient, url: str, query: str):
+    """Return the response time in microseconds, None if the request has failed"""
+    start = time.perf_counter_ns()
+    try:
+        response = await client.get(url + '/search', params={'q': query})
+        response.raise_for_status()
+    except httpx.HTTPError:
+        return None
+    return (time.perf_counter_ns() - start) // 1000
+
+
+async def measure_instance(client: httpx.AsyncClient, url: str, sample_count: int, rate: float) -> LatencyResult:
+    """Send 2 * sample_count requests, alternating the repeated and the unique queries, at rate requests/s
+
+    The requests are scheduled on absolute deadlines so a slow response does not shift the next ones,
+    and the first request (connection setup) is not recorded.
+    """
+    result = LatencyResult(url)
+    repeated_query = 'searxng ' + secrets.token_hex(4)
+    loop = asyncio.get_running_loop()
+    await measure(client, url, repeated_query)
+    deadline = loop.time()
+    for index in range(2 * sample_count):
+        deadline += 1 / rate
+        await asyncio.sleep(max(0, deadline - loop.time()))
+        repeated = index % 2 == 0
+        query = repeated_query if repeated else 'searxng ' + secrets.token_hex(4)
+        duration = await measure(client, url, query)
+        if duration is None:
+            result.errors += 1
+        elif repeated:
+            result.repeated.record(duration)
+        else:
+            result.unique.record(duration)
+    result.analyze()
+    return result
+
+
+async def check_url_list(url_list: list, sample_count: int = 20, rate: float = 0.5,
+                         concurrency: int = 8, transport=None) -> list:
+    """Measure the instances concurrently
+
+    Only a few instances are measured at the same time so the event loop does not delay
+    the responses, and each instance receives one request at a time.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check_url(client, url):
+        async with semaphore:
+            return await measure_instance(client, url, sample_count, rate)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30, limits=limits, transport=transport) as client:
+        return await asyncio.gather(*[check_url(client, url) for url in url_list])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances latency',
+                                     description='Find the instances answering repeated queries from a cache.')
+    parser.add_argument('urls', nargs='*', help='Instance URL(s), by default all')
+    parser.add_argument('--samples', type=int, default=20, help='Number of requests for each kind of query')
+    parser.add_argument('--rate', type=float, default=0.5, help='Requests per second sent to each instance')
+    parser.add_argument('--concurrency', type=int, default=8, help='Number of instances measured at the same time')
+    args = parser.parse_args(argv)
+
+    url_list = args.urls or list(model.load().keys())
+    result_list = asyncio.run(check_url_list(url_list, args.samples, args.rate, args.concurrency))
+    found = False
+    for result in result_list:
+        repeated, unique = result.repeated.percentile(50), result.unique.percentile(50)
+        status = 'ERROR' if result.is_suspicious() else 'OK'
+        found = found or result.is_suspicious()
+        print(f'{status:5} {result.url}: median repeated={repeated}us unique={unique}us '
+              f'p={result.p_value:.4f} errors={result.errors}')
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
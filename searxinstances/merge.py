@@ -0,0 +1,116 @@
+"""Three-way merge of instance lists, entry by entry
+
+It can be used as a git merge driver: add to .git/config
+
+    [merge "instances"]
+        name = instances.yml entry merge
+        driver = python -m searxinstances.merge %O %A %B
+
+.gitattributes already assigns this driver to instances.yml. When the same
+entry is changed on both sides, the merged file contains the two versions
+between conflict markers, and the driver exits with a non zero status.
+"""
+import sys
+from collections import OrderedDict
+
+from . import model
+
+
+class Conflict:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['url', 'ours', 'theirs', 'reason']
+
+    def __init__(self, url: str, ours, theirs, reason: str):
+        self.url = url
+        self.ours = ours
+        self.theirs = theirs
+        self.reason = reason
+
+    def __repr__(self):
+        return f'Conflict({self.url!r}, {self.reason!r})'
+
+
+def get_entry_key(instance):
+    return None if instance is None else instance.json_dump()
+
+
+def merge(base: model.InstanceList, ours: model.InstanceList, theirs: model.InstanceList):
+    """Return the merged InstanceList and the list of conflicts
+
+    For a conflict, the merged list keeps our version of the entry.
+    """
+    merged = model.InstanceList()
+    conflicts = []
+    url_list = list(ours.keys()) + [url for url in theirs.keys() if url not in ours]
+    url_list += [url for url in base.keys() if url not in ours and url not in theirs]
+    for url in url_list:
+        base_instance, our_instance, their_instance = base.get(url), ours.get(url), theirs.get(url)
+        base_key, our_key, their_key = map(get_entry_key, (base_instance, our_instance, their_instance))
+        if their_key in (our_key, base_key):
+            instance = our_instance
+        elif our_key == base_key:
+            instance = their_instance
+        else:
+            conflicts.append(Conflict(url, our_instance, their_instance, 'changed on both sides'))
+            instance = our_instance
+        if instance is None:
+            continue
+        try:
+            merged[url] = instance
+        except ValueError as ex:
+            # for example the same additional URL added to two different instances
+            conflicts.append(Conflict(url, None, instance, str(ex)))
+    return merged, conflicts
+
+
+def dump_conflict(conflict: Conflict) -> str:
+    def dump(instance):
+        if instance is None:
+            return ''
+        instance_list = model.InstanceList()
+        # the entry may not be valid with the other entries
+        OrderedDict.__setitem__(instance_list, conflict.url, instance)
+        return model.yaml_dump(instance_list)
+
+    return f'<<<<<<< ours ({conflict.reason})\n' + dump(conflict.ours) +\
+        '=======\n' + dump(conflict.theirs) +\
+        '>>>>>>> theirs\n'
+
+
+def load(filename: str) -> model.InstanceList:
+    # the base is empty when the file has been added on both sides
+    with open(filename, 'r', encoding='utf-8') as input_file:
+        return model.yaml_load(input_file.read()) or model.InstanceList()
+
+
+def merge_files(base_filename: str, our_filename: str, their_filename: str) -> list:
+    """Merge the three files into our_filename, return the conflicts"""
+    base = load(base_filename)
+    ours = load(our_filename)
+    theirs = load(their_filename)
+    merged, conflicts = merge(base, ours, theirs)
+    # the conflicting entries are only written between the conflict markers
+    for conflict in conflicts:
+        merged.pop(conflict.url, None)
+    content = model.yaml_dump(merged)
+    for conflict in conflicts:
+        content += dump_conflict(conflict)
+    with open(our_filename, 'w', encoding='utf-8') as output_file:
+        output_file.write(content)
+    return conflicts
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 3:
+        print('usage: python -m searxinstances.merge BASE OURS THEIRS', file=sys.stderr)
+        sys.exit(2)
+    conflicts = merge_files(*argv)
+    for conflict in conflicts:
+        print(f'CONFLICT: {conflict.url}: {conflict.reason}', file=sys.stderr)
+    if len(conflicts) > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
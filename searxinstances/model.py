@@ -1,4 +1,5 @@
 from os.path import realpath, dirname
+import sys
 from collections import OrderedDict
 import json
 import inspect
@@ -45,6 +46,12 @@ class AdditionalUrlList(OrderedDict, yaml.YAMLObject):
     yaml_tag = '!AdditionalUrlList'
     __slots__ = []
 
+    def __setitem__(self, url: str, label: str):
+        # the same labels ("Hidden Service", ...) are repeated in many instances
+        if isinstance(label, str):
+            label = sys.intern(label)
+        super().__setitem__(url, label)
+
     def __repr__(self):
         return dict(self.items()).__repr__()
 
@@ -59,9 +66,14 @@ class AdditionalUrlList(OrderedDict, yaml.YAMLObject):
 
 
 class Instance(yaml.YAMLObject):
+    """An instance
+
+    Most instances have neither comments nor additional URLs: the list and the
+    AdditionalUrlList are only allocated when the attributes are read.
+    """
 
     yaml_tag = '!Instance'
-    __slots__ = ['analytics', 'comments', 'additional_urls', 'git_url']
+    __slots__ = ['analytics', '_comments', '_additional_urls', 'git_url']
 
     def __init__(self, analytics=False, comments=None, additional_urls=None, git_url=None):
         # type check
@@ -71,38 +83,65 @@ class Instance(yaml.YAMLObject):
             raise ValueError('additional_urls is not a AdditionalUrlList instance')
         if not isinstance(git_url, (str, NoneType)):
             raise ValueError('git_url is not a str')
-        if comments is None:
-            comments = []
-        if additional_urls is None:
-            additional_urls = AdditionalUrlList()
         # assign
         self.analytics = analytics
-        self.comments = comments
-        self.additional_urls = additional_urls
+        self._comments = comments
+        self._additional_urls = additional_urls
         self.git_url = git_url
 
+    @property
+    def comments(self) -> list:
+        if self._comments is None:
+            self._comments = []
+        return self._comments
+
+    @comments.setter
+    def comments(self, comments: list):
+        self._comments = comments
+
+    @property
+    def additional_urls(self) -> AdditionalUrlList:
+        if self._additional_urls is None:
+            self._additional_urls = AdditionalUrlList()
+        return self._additional_urls
+
+    @additional_urls.setter
+    def additional_urls(self, additional_urls: AdditionalUrlList):
+        self._additional_urls = additional_urls
+
+    def get_urls(self, url: str) -> list:
+        """Return url and the additional URLs without allocating an empty AdditionalUrlList"""
+        if not self._additional_urls:
+            return [url]
+        return [url, *self._additional_urls.keys()]
+
     def to_json(self):
         return dict([
             ("analytics", self.analytics),
-            ("comments", self.comments),
-            ("additional_urls", self.additional_urls),
+            ("comments", self._comments or []),
+            ("additional_urls", self._additional_urls or {}),
             ("git_url", self.git_url),
         ])
 
+    def json_dump(self) -> str:
+        """Serialize the entry, two entries are equal when their dumps are equal"""
+        return json.dumps(self, cls=ObjectEncoder, sort_keys=True)
+
     def __repr__(self):
         return str(self.to_json())
 
     @staticmethod
     def yaml_representer(dumper: yaml.Dumper, instance):
+        # pylint: disable=protected-access
         output = []
         if instance.analytics:
             output.append(('analytics', instance.analytics))
         if instance.git_url is not None:
             output.append(('git_url', instance.git_url))
-        if instance.comments is not None and len(instance.comments) > 0:
-            output.append(('comments', instance.comments))
-        if instance.additional_urls is not None and len(instance.additional_urls) > 0:
-            output.append(('additional_urls', instance.additional_urls))
+        if instance._comments:
+            output.append(('comments', instance._comments))
+        if instance._additional_urls:
+            output.append(('additional_urls', instance._additional_urls))
         return dumper.represent_dict(output)
 
     @staticmethod
@@ -127,7 +166,7 @@ class InstanceList(OrderedDict, yaml.YAMLObject):
         if not isinstance(instance, Instance):
             raise ValueError('instance is not a Instance but is ' + str(instance))
         # check for duplicate URL
-        new_urls = set([url, *instance.additional_urls.keys()])
+        new_urls = set(instance.get_urls(url))
         conflict_urls = new_urls.intersection(self.urls)
         if len(conflict_urls) > 0:
             raise ValueError(f'{", ".join(conflict_urls)} already declared')
@@ -143,7 +182,7 @@ class InstanceList(OrderedDict, yaml.YAMLObject):
     def urls(self):
         all_urls = set()
         for url, instance in self.items():
-            all_urls.update(set([url, *instance.additional_urls.keys()]))
+            all_urls.update(instance.get_urls(url))
         return all_urls
 
     def json_dump(self):
@@ -0,0 +1,177 @@
+"""Registrable domains according to the Public Suffix List
+
+The list is compiled into a trie of reversed labels: a lookup walks the
+labels of the host once. To update the vendored list:
+
+    curl -o searxinstances/public_suffix_list.dat https://publicsuffix.org/list/public_suffix_list.dat
+"""
+from os.path import realpath, dirname
+from functools import lru_cache
+import ipaddress
+
+import idna
+import rfc3986
+
+from . import model
+
+
+FILENAME = realpath(dirname(realpath(__file__))) + '/public_suffix_list.dat'
+
+RULE = 1
+EXCEPTION = 2
+
+
+class Node:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['children', 'rule', 'private']
+
+    def __init__(self):
+        self.children = {}
+        self.rule = None
+        self.private = False
+
+
+class PublicSuffix:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['suffix', 'private']
+
+    def __init__(self, suffix: str, private: bool):
+        self.suffix = suffix
+        self.private = private
+
+    def __repr__(self):
+        return f'PublicSuffix({self.suffix!r}, private={self.private})'
+
+
+class PublicSuffixList:
+
+    def __init__(self, content: str):
+        self.root = Node()
+        private = False
+        for line in content.splitlines():
+            line = line.strip()
+            if line.startswith('// ===BEGIN PRIVATE DOMAINS==='):
+                private = True
+            if line == '' or line.startswith('//'):
+                continue
+            rule = line.split()[0].lower()
+            self.add_rule(rule, private)
+
+    def add_rule(self, rule: str, private: bool):
+        rule_type = RULE
+        if rule.startswith('!'):
+            rule_type = EXCEPTION
+            rule = rule[1:]
+        node = self.root
+        for label in reversed(rule.split('.')):
+            # the rules are in Unicode, the hosts are IDNA 2008 encoded by normalize_url
+            if not label.isascii():
+                label = get_ascii_label(label)
+            node = node.children.setdefault(label, Node())
+        node.rule = rule_type
+        node.private = private
+
+    def get_public_suffix(self, host: str) -> PublicSuffix:
+        labels = host.lower().rstrip('.').split('.')
+        # the default rule is "*"
+        length, private = 1, False
+        node = self.root
+        for depth, label in enumerate(reversed(labels), start=1):
+            wildcard = node.children.get('*')
+            node = node.children.get(label)
+            if node is not None and node.rule == EXCEPTION:
+                # the exception rule minus its leftmost label
+                length, private = depth - 1, node.private
+                break
+            if wildcard is not None and wildcard.rule == RULE:
+                length, private = depth, wildcard.private
+            if node is None:
+                break
+            if node.rule == RULE:
+                length, private = depth, node.private
+        return PublicSuffix('.'.join(labels[-length:]), private)
+
+    def get_registrable_domain(self, host: str):
+        """Return the public suffix plus one label, None if host is a public suffix"""
+        host = host.lower().rstrip('.')
+        public_suffix = self.get_public_suffix(host)
+        if host == public_suffix.suffix:
+            return None
+        label_count = public_suffix.suffix.count('.') + 2
+        return '.'.join(host.split('.')[-label_count:])
+
+
+def get_ascii_label(label: str) -> str:
+    try:
+        return idna.encode(label).decode('ascii')
+    except idna.IDNAError:
+        # not a valid IDNA 2008 label: no normalized host can match it
+        return label
+
+
+@lru_cache(maxsize=1)
+def get_public_suffix_list() -> PublicSuffixList:
+    with open(FILENAME, 'r', encoding='utf-8') as input_file:
+        return PublicSuffixList(input_file.read())
+
+
+def is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip('[]'))
+    except ValueError:
+        return False
+    return True
+
+
+def get_url_host(url: str):
+    host = rfc3986.urlparse(url).host
+    if host is None or is_ip_address(host) or model.host_use_http(host):
+        # there is no registrable domain for the IP addresses, .onion and .i2p hosts
+        return None
+    return host
+
+
+def get_shared_domain_error(url: str):
+    """Return an error message if the URL is on a shared domain (e.g. eu.org, ddns.net)"""
+    host = get_url_host(url)
+    if host is None:
+        return None
+    public_suffix = get_public_suffix_list().get_public_suffix(host)
+    if public_suffix.private:
+        return f'{url}: {public_suffix.suffix} is a shared domain'
+    if host == public_suffix.suffix:
+        return f'{url}: {host} is a public suffix'
+    return None
+
+
+def get_registrable_domains(instance_list: model.InstanceList) -> dict:
+    """Map the registrable domains to the URLs of the instance list (additional URLs are ignored)"""
+    public_suffix_list = get_public_suffix_list()
+    registrable_domains = {}
+    for url in instance_list.keys():
+        host = get_url_host(url)
+        if host is None:
+            continue
+        registrable_domain = public_suffix_list.get_registrable_domain(host)
+        if registrable_domain is not None:
+            registrable_domains.setdefault(registrable_domain, []).append(url)
+    return registrable_domains
+
+
+def get_shared_domain_errors(instance_list: model.InstanceList) -> list:
+    errors = []
+    for url, instance in instance_list.items():
+        for instance_url in instance.get_urls(url):
+            error = get_shared_domain_error(instance_url)
+            if error is not None:
+                errors.append(error)
+    return errors
+
+
+def get_same_owner_clusters(instance_list: model.InstanceList) -> dict:
+    """Return the registrable domains with more than one instance"""
+    return {
+        registrable_domain: url_list
+        for registrable_domain, url_list in get_registrable_domains(instance_list).items()
+        if len(url_list) > 1
+    }
@@ -0,0 +1,199 @@
+"""Scan the TLS certificates and handshakes of the instances
+
+For each clearnet URL: certificate expiry, issuer, SAN coverage of the host,
+protocol and cipher. The results are cached with a TTL: a run only scans the
+hosts whose cached result has expired.
+"""
+import argparse
+import concurrent.futures
+import json
+import os.path
+import socket
+import ssl
+import sys
+import time
+
+import rfc3986
+
+from . import model
+
+
+CACHE_FILENAME = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                              'searxinstances', 'tls.json')
+CACHE_TTL = 12 * 3600
+MIN_DAYS_BEFORE_EXPIRY = 14
+
+
+class TlsResult:  # pylint: disable=too-many-instance-attributes
+
+    __slots__ = ['host', 'port', 'scanned_at', 'not_after', 'issuer', 'san', 'san_covers_host',
+                 'protocol', 'cipher', 'error']
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(self, host: str, port: int, scanned_at: float = None, not_after: float = None, issuer: str = None,
+                 san: list = None, san_covers_host: bool = None, protocol: str = None, cipher: str = None,
+                 error: str = None):
+        self.host = host
+        self.port = port
+        self.scanned_at = time.time() if scanned_at is None else scanned_at
+        self.not_after = not_after
+        self.issuer = issuer
+        self.san = san or []
+        self.san_covers_host = san_covers_host
+        self.protocol = protocol
+        self.cipher = cipher
+        self.error = error
+
+    @property
+    def days_before_expiry(self):
+        if self.not_after is None:
+            return None
+        return (self.not_after - time.time()) / 86400
+
+    def get_errors(self) -> list:
+        if self.error is not None:
+            return [self.error]
+        errors = []
+        if not self.san_covers_host:
+            errors.append(f'{self.host} is not in the certificate names {", ".join(self.san)}')
+        if self.days_before_expiry < MIN_DAYS_BEFORE_EXPIRY:
+            errors.append(f'the certificate expires in {self.days_before_expiry:.0f} days')
+        return errors
+
+    def to_json(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f'TlsResult({self.host!r}, {self.port!r}, protocol={self.protocol!r}, error={self.error!r})'
+
+
+def match_host(pattern: str, host: str) -> bool:
+    """Match a DNS name of a certificate, the wildcard can only be the leftmost label"""
+    pattern, host = pattern.lower().rstrip('.'), host.lower().rstrip('.')
+    if pattern.startswith('*.'):
+        return '.' in host and host.split('.', 1)[1] == pattern[2:]
+    return pattern == host
+
+
+def get_issuer(cert: dict) -> str:
+    attributes = dict(attribute for rdn in cert.get('issuer', ()) for attribute in rdn)
+    return attributes.get('organizationName') or attributes.get('commonName')
+
+
+class TlsScanner:  # pylint: disable=too-few-public-methods
+
+    def __init__(self, context: ssl.SSLContext = None, timeout: float = 10):
+        if context is None:
+            context = ssl.create_default_context()
+        # the host is checked against the SAN by the scanner, the chain is still verified
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_REQUIRED
+        self.context = context
+        self.timeout = timeout
+
+    def scan(self, host: str, port: int = 443) -> TlsResult:
+        try:
+            with socket.create_connection((host, port), timeout=self.timeout) as sock:
+                with self.context.wrap_socket(sock, server_hostname=host) as ssock:
+                    cert = ssock.getpeercert()
+                    san = [value for kind, value in cert.get('subjectAltName', ()) if kind in ('DNS', 'IP Address')]
+                    return TlsResult(
+                        host, port,
+                        not_after=ssl.cert_time_to_seconds(cert['notAfter']),
+                        issuer=get_issuer(cert),
+                        san=san,
+                        san_covers_host=any(match_host(name, host) for name in san),
+                        protocol=ssock.version(),
+                        cipher=ssock.cipher()[0],
+                    )
+        except (OSError, ssl.SSLError, ValueError) as ex:
+            return TlsResult(host, port, error=str(ex) or ex.__class__.__name__)
+
+
+class TlsCache:
+
+    def __init__(self, filename: str = CACHE_FILENAME, ttl: float = CACHE_TTL):
+        self.filename = filename
+        self.ttl = ttl
+        self.results = {}
+        if filename is not None and os.path.isfile(filename):
+            with open(filename, 'r', encoding='utf-8') as input_file:
+                for key, value in json.load(input_file).items():
+                    # ignore the fields written by an older version
+                    fields = {name: value[name] for name in TlsResult.__slots__ if name in value}
+                    self.results[key] = TlsResult(**fields)
+
+    def get(self, host: str, port: int):
+        result = self.results.get(f'{host}:{port}')
+        if result is None or time.time() - result.scanned_at > self.ttl:
+            return None
+        return result
+
+    def set(self, result: TlsResult):
+        self.results[f'{result.host}:{result.port}'] = result
+
+    def save(self):
+        if self.filename is None:
+            return
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        with open(self.filename, 'w', encoding='utf-8') as output_file:
+            json.dump({key: result.to_json() for key, result in self.results.items()}, output_file)
+
+
+def get_host_port_list(instance_list: model.InstanceList) -> list:
+    host_port_list = []
+    for url, instance in instance_list.items():
+        for instance_url in instance.get_urls(url):
+            purl = rfc3986.urlparse(instance_url)
+            if purl.scheme == 'https':
+                host_port = (purl.host, int(purl.port or 443))
+                if host_port not in host_port_list:
+                    host_port_list.append(host_port)
+    return host_port_list
+
+
+def scan(host_port_list: list, scanner: TlsScanner, cache: TlsCache, concurrency: int = 32) -> list:
+    """Return the results in the order of host_port_list, only the expired cache entries are scanned
+
+    The errors are not cached: a host which was briefly unreachable is scanned again on the next run.
+    """
+    results = {}
+    to_scan = []
+    for host, port in host_port_list:
+        result = cache.get(host, port)
+        if result is not None:
+            results[(host, port)] = result
+        else:
+            to_scan.append((host, port))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result in executor.map(lambda host_port: scanner.scan(*host_port), to_scan):
+            results[(result.host, result.port)] = result
+            if result.error is None:
+                cache.set(result)
+    cache.save()
+    return [results[host_port] for host_port in host_port_list]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances tls',
+                                     description='Check the TLS certificates of the instances.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Number of concurrent handshakes')
+    parser.add_argument('--ttl', type=float, default=CACHE_TTL, help='Seconds before a cached result is scanned again')
+    args = parser.parse_args(argv)
+
+    host_port_list = get_host_port_list(model.load())
+    result_list = scan(host_port_list, TlsScanner(), TlsCache(ttl=args.ttl), args.concurrency)
+    found = False
+    for result in result_list:
+        errors = result.get_errors()
+        found = found or len(errors) > 0
+        status = 'ERROR' if errors else 'OK'
+        details = '; '.join(errors) if errors else \
+            f'{result.protocol} {result.cipher}, {result.issuer}, expires in {result.days_before_expiry:.0f} days'
+        print(f'{status:5} {result.host}:{result.port}: {details}')
+    if found:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
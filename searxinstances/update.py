@@ -1,20 +1,30 @@
 import argparse
+import concurrent.futures
+import functools
+import importlib
 import re
+import sys
 import os.path
+import hashlib
+from io import BytesIO
 from abc import abstractmethod
 
 import git
+from git.index.typ import BaseIndexEntry
+from git.objects import Blob
+from gitdb import IStream
 import httpx
 import rfc3986
 import idna
 
-from . import model
-from .utils import editor
+from . import model, issues, issue_form, publicsuffix
+from .utils import editor, lock
 
 
-class UserRequest:
+class UserRequest:  # pylint: disable=too-many-instance-attributes
 
-    __slots__ = ['request_id', 'request_url', 'user', 'command', 'url', 'message']
+    __slots__ = ['request_id', 'request_url', 'user', 'command', 'url', 'message',
+                 'base_entry', 'related_issues', 'issue_form']
     user_request_name = None
 
     # pylint: disable=too-many-arguments
@@ -24,6 +34,12 @@ class UserRequest:
         self.user = user
         self.url = url
         self.message = message
+        # json_dump() of the entry the buffer has been built from, None if there is no entry
+        self.base_entry = None
+        # numbers of the other issues of the mirror mentioning the host
+        self.related_issues = []
+        # issue_form.IssueForm of the issue body, None without issue
+        self.issue_form = None
 
     @abstractmethod
     def execute(self, instance_list: model.InstanceList, instance_list_update: model.InstanceList):
@@ -49,13 +65,88 @@ class UserRequest:
             "#> -- MESSAGE -----------------------\n" +\
             add_comment_prefix(self.message, prefix='#> ') + "\n"
 
-    def run(self, instance_list):
+    def get_checks(self, instance_list: model.InstanceList) -> list:
+        """Return the issue form fields to triage, the URLs on the same host and the related issues"""
+        checks = []
+        if self.issue_form is not None:
+            checks += [f'unchecked: {label}' for label in self.issue_form.unchecked]
+            if self.issue_form.source_code_url is not None:
+                checks.append(f'source code: {self.issue_form.source_code_url}')
+            if self.issue_form.matrix_username is not None:
+                checks.append(f'matrix: {self.issue_form.matrix_username}')
+        host = get_host(self.url)
+        if host is None:
+            return checks
+        return checks + [
+            f'{url} is on the same host'
+            for url, instance in instance_list.items()
+            for instance_url in instance.get_urls(url)
+            if get_host(instance_url) == host and url != self.url
+        ] + [f'issue #{number} mentions {host}' for number in self.related_issues]
+
+    def check_base_entry(self, instance_list: model.InstanceList):
+        """Raise a ValueError if the entry has been changed since the buffer has been built
+
+        The new entry becomes the base: saving the buffer again applies the request anyway.
+        """
+        instance = instance_list.get(self.url)
+        entry = None if instance is None else instance.json_dump()
+        if entry == self.base_entry:
+            return
+        self.base_entry = entry
+        if instance is None:
+            raise ValueError(f'{self.url} has been removed by another reviewer')
+        tmp_instance_list = model.InstanceList()
+        tmp_instance_list[self.url] = instance
+        raise ValueError(f'{self.url} has been changed by another reviewer, the entry is now:\n' +
+                         model.yaml_dump(tmp_instance_list))
+
+    def prepare(self, repo_path: str) -> list:
+        """Slow checks, which do not depend on the instance list: run in the background
+
+        * the commits adding or removing the host of the request,
+        * the HTTP status of the URL.
+
+        The checks are best effort: an exception is returned as a check, it never stops the review.
+        """
+        host = get_host(self.url)
+        if host is None:
+            return []
+        checks = []
+        # pylint: disable=broad-exception-caught
+        try:
+            history = git.Git(repo_path).log('-S', host, '--format=%h %ad %s', '--date=short',
+                                             '--', os.path.relpath(model.FILENAME, repo_path))
+            checks += [f'history: {line}' for line in history.splitlines()]
+        except Exception as ex:
+            checks.append(f'history: {ex.__class__.__name__} {ex}')
+        if not model.host_use_http(host):
+            try:
+                response = httpx.get(self.url, timeout=10, follow_redirects=True)
+                checks.append(f'{self.url}: HTTP {response.status_code} in {response.elapsed.total_seconds():.1f}s')
+            except Exception as ex:
+                checks.append(f'{self.url}: {ex.__class__.__name__} {ex}')
+        return checks
+
+    def run(self, instance_list, apply, checks=None):
+        """Edit the request until it is valid, then call apply(instance_list_update, commit_message)
+
+        apply returns the updated InstanceList or raises a ValueError: in this case the
+        error is shown in the editor, for example when another reviewer has changed the
+        same instance in the meantime. Return None if the request has been cancelled.
+        """
         # set after the while
         instance_list_update = model.InstanceList()
         commit_message = None
 
         #
         content = self.get_content(instance_list)  # pylint: disable=assignment-from-no-return
+        instance = instance_list.get(self.url)
+        self.base_entry = None if instance is None else instance.json_dump()
+        checks = self.get_checks(instance_list) + (checks or [])
+        if len(checks) > 0:
+            content += "\n#> -- CHECKS ------------------------\n" +\
+                add_comment_prefix('\n'.join(checks), prefix='#> ')
         valid = False
         edit = True
         error_msg = None
@@ -91,21 +182,21 @@ class UserRequest:
                 error_msg = exception_to_error_msg(ex)
                 continue
 
-            # exit while if no error
-            if error_msg is None:
-                # done
-                edit = False
-                valid = True
+            # update and commit with the current content of instances.yml
+            try:
+                instance_list = apply(instance_list_update, commit_message)
+            except ValueError as ex:
+                edit = True
+                error_msg = exception_to_error_msg(ex)
+                continue
 
-        if valid:
-            # update
-            self.execute(instance_list, instance_list_update)
-            model.save(instance_list)
+            # done
+            edit = False
+            valid = True
 
-            # commit
-            return (True, commit_message)
-        else:
-            return (False, None)
+        if valid:
+            return instance_list
+        return None
 
 
 class UserRequestAdd(UserRequest):
@@ -120,6 +211,7 @@ class UserRequestAdd(UserRequest):
             self.get_generic_content()
 
     def execute(self, instance_list: model.InstanceList, instance_list_update: model.InstanceList):
+        check_shared_domain(instance_list_update)
         for url, instance in instance_list_update.items():
             instance_list[url] = instance
 
@@ -132,6 +224,7 @@ class UserRequestDelete(UserRequest):
         return self.get_generic_content()
 
     def execute(self, instance_list: model.InstanceList, instance_list_update: model.InstanceList):
+        check_declared(instance_list, self.url)
         del instance_list[self.url]
 
 
@@ -147,43 +240,110 @@ class UserRequestEdit(UserRequest):
             self.get_generic_content()
 
     def execute(self, instance_list: model.InstanceList, instance_list_update: model.InstanceList):
+        check_shared_domain(instance_list_update)
+        check_declared(instance_list, self.url)
         del instance_list[self.url]
         for url, instance in instance_list_update.items():
             instance_list[url] = instance
 
 
+def check_declared(instance_list: model.InstanceList, url: str):
+    if url not in instance_list:
+        raise ValueError(f'{url} is not in the instance list')
+
+
+def check_shared_domain(instance_list: model.InstanceList):
+    errors = publicsuffix.get_shared_domain_errors(instance_list)
+    if len(errors) > 0:
+        raise ValueError('\n'.join(errors))
+
+
 class GitCommitContext:
+    """Commit a list of files, or restore them from HEAD
+
+    The blobs, the tree and the commit are written directly in the object database
+    by GitPython, so there is no git subprocess for each request. GitPython does not
+    apply the eol conversion and the filters: when core.autocrlf or an attribute asks
+    for them, git add and git commit are used instead.
+    """
 
     def __init__(self, repo, file_name_list):
         self.repo = repo
         self.file_name_list = file_name_list
         self.message = None
+        self.in_process = not has_conversion(repo, tuple(map(self.get_repo_path, file_name_list)))
 
-    def __enter__(self):
-        count_staged_files = len(self.repo.index.diff("HEAD"))
-        if count_staged_files > 0:
+    def get_repo_path(self, file_name: str) -> str:
+        return os.path.relpath(os.path.realpath(file_name), self.repo.working_tree_dir).replace(os.sep, '/')
+
+    def check(self):
+        """Raise a ValueError if there are staged files or if one of the files is dirty"""
+        if not self.in_process:
+            if len(self.repo.index.diff("HEAD")) > 0:
+                raise ValueError('There are staged file')
+            for file_name in self.file_name_list:
+                if self.repo.is_dirty(path=file_name):
+                    raise ValueError(f'{file_name} is dirty')
+            return
+        head_tree = self.repo.head.commit.tree
+        if self.repo.index.write_tree().binsha != head_tree.binsha:
             raise ValueError('There are staged file')
         for file_name in self.file_name_list:
-            if self.repo.is_dirty(path=file_name):
+            with open(file_name, 'rb') as input_file:
+                content = input_file.read()
+            if git_blob_binsha(content) != (head_tree / self.get_repo_path(file_name)).binsha:
                 raise ValueError(f'{file_name} is dirty')
+
+    def __enter__(self):
+        self.check()
         return self
 
     def commit(self, message: str):
         self.message = message
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        if not exc_type and self.message is not None:
+        if not self.in_process:
+            if not exc_type and self.message is not None:
+                for file_name in self.file_name_list:
+                    self.repo.git.add(file_name)
+                commit = self.repo.git.commit('-m', self.message)
+                print('Commit', commit)
+            else:
+                for file_name in self.file_name_list:
+                    self.repo.git.checkout(file_name)
+        elif not exc_type and self.message is not None:
+            entries = []
             for file_name in self.file_name_list:
-                self.repo.git.add(file_name)
-            commit = self.repo.git.commit('-m', self.message)
-            print('Commit', commit)
+                with open(file_name, 'rb') as input_file:
+                    content = input_file.read()
+                istream = self.repo.odb.store(IStream(Blob.type, len(content), BytesIO(content)))
+                entries.append(BaseIndexEntry((Blob.file_mode, istream.binsha, 0, self.get_repo_path(file_name))))
+            index = self.repo.index
+            index.add(entries)
+            commit = index.commit(self.message)
+            print('Commit', commit.hexsha[:7], commit.summary)
         else:
+            head_tree = self.repo.head.commit.tree
             for file_name in self.file_name_list:
-                self.repo.git.checkout(file_name)
+                with open(file_name, 'wb') as output_file:
+                    output_file.write((head_tree / self.get_repo_path(file_name)).data_stream.read())
         # Don't exceptions
         return False
 
 
+@functools.lru_cache(maxsize=None)
+def has_conversion(repo, repo_path_list: tuple) -> bool:
+    """True if git converts the files between the worktree and the object database"""
+    if str(repo.config_reader().get_value('core', 'autocrlf', 'false')).lower() in ('true', 'input'):
+        return True
+    attributes = repo.git.check_attr('filter', 'text', 'eol', 'ident', 'working-tree-encoding', '--', *repo_path_list)
+    return any(line.rsplit(': ', 1)[-1] not in ('unspecified', 'unset') for line in attributes.splitlines())
+
+
+def git_blob_binsha(content: bytes) -> bytes:
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).digest()
+
+
 def get_git_repo():
     repo_path = os.path.realpath(os.path.dirname(os.path.realpath(__file__)) + '/..')
     repo = git.Repo(repo_path)
@@ -246,22 +406,76 @@ def extract_commit_message(content: str) -> str:
     return result
 
 
-def run_user_request_list(instance_list: model.InstanceList, user_request_list):
-    repo = get_git_repo()
-    for user_request in user_request_list:
-        print(user_request.user_request_name, user_request.url)
-        with GitCommitContext(repo, [model.FILENAME]) as git_commit:
-            assert isinstance(git_commit, GitCommitContext)
-            valid, commit_message = user_request.run(instance_list)
-            if valid:
+def apply_user_request(repo, user_request: UserRequest, instance_list_update: model.InstanceList,
+                       commit_message: str) -> model.InstanceList:
+    """Apply the request to the current instances.yml and commit
+
+    Several reviewers or scripts can process requests at the same time: instances.yml
+    is locked only while it is reloaded, updated and committed. A ValueError is raised
+    when the entry has been changed by someone else since the buffer has been built.
+    """
+    try:
+        with lock.lock_file(get_lock_filename(repo)):
+            instance_list = model.load(model.FILENAME)
+            user_request.check_base_entry(instance_list)
+            with GitCommitContext(repo, [model.FILENAME]) as git_commit:
+                user_request.execute(instance_list, instance_list_update)
+                model.save(instance_list, model.FILENAME)
                 git_commit.commit(commit_message)
-            else:
+    except lock.LockTimeout as ex:
+        raise ValueError(f'{ex}: save the buffer again to retry') from ex
+    return instance_list
+
+
+def get_lock_filename(repo) -> str:
+    return os.path.join(repo.git_dir, os.path.basename(model.FILENAME) + '.lock')
+
+
+def check_worktree(repo):
+    """Raise a ValueError if instances.yml is dirty or if there are staged files
+
+    The lock is taken so a commit of another reviewer in progress is not seen as a dirty file.
+    """
+    with lock.lock_file(get_lock_filename(repo)):
+        GitCommitContext(repo, [model.FILENAME]).check()
+
+
+def run_user_request_list(instance_list: model.InstanceList, user_request_list, prefetch: int = 2):
+    """Run the requests one after the other
+
+    The slow checks of the next `prefetch` requests run in background threads
+    while the reviewer edits the current one.
+    """
+    if prefetch < 0:
+        raise ValueError(f'prefetch must be >= 0, not {prefetch}')
+    repo = get_git_repo()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(prefetch, 1)) as executor:
+        futures = {}
+
+        def submit(index):
+            if index < len(user_request_list) and index not in futures:
+                futures[index] = executor.submit(user_request_list[index].prepare, repo.working_tree_dir)
+
+        for index, user_request in enumerate(user_request_list):
+            for next_index in range(index, index + prefetch + 1):
+                submit(next_index)
+            print(user_request.user_request_name, user_request.url)
+            # fail before the editor is opened: the reviewer cannot fix a dirty worktree from the buffer
+            check_worktree(repo)
+            checks = futures.pop(index).result()
+
+            def apply(instance_list_update, commit_message, user_request=user_request):
+                return apply_user_request(repo, user_request, instance_list_update, commit_message)
+
+            instance_list = user_request.run(instance_list, apply, checks)
+            if instance_list is None:
                 print('Cancelled')
+                for future in futures.values():
+                    future.cancel()
                 break
 
 
 TITLE_RE = re.compile('[a-z]*[ ]?(http.+)', re.IGNORECASE)
-COMMENT_RE = re.compile('<!--.*-->', re.MULTILINE | re.DOTALL)
 LABEL_TO_CLASS = {
     'instance add': UserRequestAdd,
     'instance delete': UserRequestDelete,
@@ -305,6 +519,12 @@ def normalize_url(url):
     return None
 
 
+def get_host(url):
+    if url is None:
+        return None
+    return rfc3986.urlparse(url).host
+
+
 def get_user_request_class(label_names: list):
     user_request_class = None
     for l_name in label_names:
@@ -316,49 +536,79 @@ def get_user_request_class(label_names: list):
     return user_request_class
 
 
-def load_user_request_list_from_github(github_issue_list) -> list:
+def get_user_request(issue: dict):
+    """Return the UserRequest of a GitHub issue, None if the issue is not a request"""
+    if not len(list(filter(lambda label: label.get('name') == 'instance', issue['labels']))):
+        return None
+    request_number = issue.get('number')
+    request_url = issue.get('html_url')
+    user = issue.get('user').get('login')
+    message = issue_form.remove_comments(issue.get('body') or '').strip()
+
+    # url
+    rtitle = re.search(TITLE_RE, issue.get('title', ''))
+    if rtitle is None:
+        print(f'Ignoring #{request_number}: URL not found in the title of issue')
+        return None
+    url = normalize_url(rtitle.group(1))
+
+    # user_request_class
+    label_names = set(map(lambda label: label.get('name'), issue['labels']))
+    user_request_class = get_user_request_class(label_names)
+    if user_request_class is None:
+        # incoherent labels, for example add and edit at the same time
+        print(f'Ignoring #{request_number}: Incoherent labels: {" ".join(label_names)}')
+        return None
+
+    # create a new instance of UserRequest
+    user_request = user_request_class(request_number, request_url, user, url, message)
+    user_request.issue_form = issue_form.parse(issue.get('body'))
+    return user_request
+
+
+def load_user_request_list_from_github(github_issue_list, offline: bool = False,
+                                       issue_mirror: issues.IssueMirror = None) -> list:
+    if issue_mirror is None:
+        with issues.IssueMirror() as default_issue_mirror:
+            return load_user_request_list_from_github(github_issue_list, offline, default_issue_mirror)
     user_request_list = []
-    with httpx.Client() as client:
-        response = client.get('https://api.github.com/repos/searxng/searx-instances/issues?state=open')
-        rjson = response.json()
-    for issue in rjson:
+    if not offline:
+        with httpx.Client() as client:
+            issue_mirror.sync(client)
+    issue_list = issue_mirror.get_issue_list(state='open')
+    for issue in issue_list:
         if len(github_issue_list) > 0 and issue.get('number') not in github_issue_list:
             # There is an issue selection (len is not zero),
             # and the current issue is not in the list
             continue
-        if len(list(filter(lambda label: label.get('name') == 'instance', issue['labels']))):
-            request_number = issue.get('number')
-            request_url = issue.get('html_url')
-            user = issue.get('user').get('login')
-            message = re.sub(COMMENT_RE, '', issue.get('body', '')).strip()
-
-            # url
-            rtitle = re.search(TITLE_RE, issue.get('title', ''))
-            if rtitle is None:
-                print(f'Ignoring #{request_number}: URL not found in the title of issue')
-                continue
-            url = normalize_url(rtitle.group(1))
-
-            # user_request_class
-            label_names = set(map(lambda label: label.get('name'), issue['labels']))
-            user_request_class = get_user_request_class(label_names)
-            if user_request_class is None:
-                # incoherent labels, for example add and edit at the same time
-                print(f'Ignoring #{request_number}: Incoherent labels: {" ".join(label_names)}')
-                continue
-
-            # create and add a new instance of UserRequest
-            user_request = user_request_class(request_number, request_url, user, url, message)
+        user_request = get_user_request(issue)
+        if user_request is not None:
+            # the previous submissions of the same instance
+            user_request.related_issues = [
+                number for number in issue_mirror.search(get_host(user_request.url) or user_request.url)
+                if number != user_request.request_id
+            ]
             user_request_list.append(user_request)
     return user_request_list
 
 
-def load_user_request_list():
+def non_negative_int(value: str) -> int:
+    result = int(value)
+    if result < 0:
+        raise argparse.ArgumentTypeError(f'{value} is not >= 0')
+    return result
+
+
+def parse_args():
     parser = argparse.ArgumentParser(description='Update the instance list according to the github issues.')
     parser.add_argument('--github-issues',
                         type=int, nargs='*', dest='github_issue_list',
                         help='Github issue number to process, by default all',
                         default=None)
+    parser.add_argument('--offline',
+                        action='store_true', dest='offline',
+                        help='Use the local copy of the github issues without updating it',
+                        default=False)
     parser.add_argument('--add',
                         type=str, nargs='*', dest='add_instances',
                         help='Add instance(s)',
@@ -371,11 +621,17 @@ def load_user_request_list():
                         type=str, nargs='*', dest='edit_instances',
                         help='Edit instance(s)',
                         default=[])
-    args = parser.parse_args()
+    parser.add_argument('--prefetch',
+                        type=non_negative_int, dest='prefetch',
+                        help='Number of requests checked in the background while editing, default 2',
+                        default=2)
+    return parser.parse_args()
+
 
+def load_user_request_list(args):
     user_request_list = []
     if args.github_issue_list is not None:
-        user_request_list += load_user_request_list_from_github(args.github_issue_list)
+        user_request_list += load_user_request_list_from_github(args.github_issue_list, args.offline)
     if len(args.add_instances) > 0:
         for url in args.add_instances:
             user_request_list.append(UserRequestAdd(None, None, None, normalize_url(url), ''))
@@ -388,10 +644,25 @@ def load_user_request_list():
     return user_request_list
 
 
+# searxinstances <command> [args]: the modules implementing the other commands
+COMMANDS = {
+    'hosting': 'searxinstances.hosting',
+    'versions': 'searxinstances.versions',
+    'latency': 'searxinstances.latency',
+    'uptime': 'searxinstances.uptime',
+    'export': 'searxinstances.export',
+    'tls': 'searxinstances.tls',
+}
+
+
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        importlib.import_module(COMMANDS[sys.argv[1]]).main(sys.argv[2:])
+        return
+    args = parse_args()
     instance_list = model.load()
-    user_request_list = load_user_request_list()
-    run_user_request_list(instance_list, user_request_list)
+    user_request_list = load_user_request_list(args)
+    run_user_request_list(instance_list, user_request_list, args.prefetch)
 
 
 if __name__ == "__main__":
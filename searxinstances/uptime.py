@@ -0,0 +1,245 @@
+"""Rolling uptime of the instances from exported status histories
+
+The input files contain samples, each one with a URL (or a host), a time and
+a status:
+
+* CSV: a header with the `url`, `time` and `status` columns,
+* JSON or YAML: a list of mappings with the same keys, or a mapping from a
+  URL to a list of mappings with the `time` and `status` keys.
+
+The time is an ISO 8601 string or a number of seconds since the epoch:
+milliseconds, as exported by JavaScript, are rejected.
+
+The samples are counted per URL and per day while the files are read, so the
+memory does not depend on the number of samples, then the 7, 14 and 30 day
+windows are computed from the daily counts. A host without URL is counted as
+the URL of the host without path. The URL and the day of the samples are parsed
+once per distinct URL and per distinct UTC date.
+"""
+import argparse
+import csv
+import datetime
+import json
+import sys
+
+import rfc3986
+import yaml
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+from . import model
+
+
+WINDOWS = (7, 14, 30)
+# (window, minimum uptime, rule)
+RULES = (
+    (30, 0.90, 'monthly uptime below 90%'),
+    (14, 0.95, 'uptime below 95% (required to add an instance again)'),
+)
+UP_STATUS = {'up', 'degraded', 'ok', 'true'}
+# 5138-11-16: a larger epoch time is in milliseconds
+MAX_EPOCH_SECONDS = 10 ** 11
+
+
+def get_url(url_or_host: str) -> str:
+    """Return the URL as written in instances.yml: lower case scheme and host, no trailing slash"""
+    url_or_host = url_or_host.strip()
+    if '://' not in url_or_host:
+        host = get_ascii_host(url_or_host.rstrip('/'))
+        return ('http://' if model.host_use_http(host) else 'https://') + host
+    purl = rfc3986.urlparse(url_or_host)
+    purl = purl.copy_with(scheme=(purl.scheme or '').lower(), host=get_ascii_host(purl.host or ''),
+                          path=(purl.path or '').rstrip('/'), query=None, fragment=None)
+    return purl.unsplit()
+
+
+def get_ascii_host(host: str) -> str:
+    host = host.lower()
+    if not host.isascii():
+        # the hosts of instances.yml are IDNA encoded
+        host = host.encode('idna').decode('ascii')
+    return host
+
+
+def get_utc_date(value: str):
+    """Return the YYYY-MM-DD prefix of an ISO 8601 time in UTC or without offset, None otherwise"""
+    if len(value) < 10 or value[4] != '-' or value[7] != '-':
+        return None
+    time_part = value[10:]
+    if time_part.endswith('Z') or time_part.endswith('+00:00') or ('+' not in time_part and '-' not in time_part):
+        return value[:10]
+    return None
+
+
+def get_day(value) -> int:
+    """Return the number of days since the epoch (UTC)"""
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if isinstance(value, (int, float)):
+        if abs(value) >= MAX_EPOCH_SECONDS:
+            raise ValueError(f'time {value} is not in seconds since the epoch (milliseconds are not accepted)')
+        return int(value // 86400)
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        value = value.date()
+    return value.toordinal() - datetime.date(1970, 1, 1).toordinal()
+
+
+def is_up(status) -> bool:
+    if isinstance(status, bool):
+        return status
+    if isinstance(status, (int, float)):
+        # 0 / 1, or an HTTP status code
+        return status == 1 or 200 <= status < 400
+    status = str(status).strip().lower()
+    if status.isdigit():
+        return is_up(int(status))
+    return status in UP_STATUS
+
+
+class UptimeAggregator:
+    """Count the samples per URL and per day"""
+
+    __slots__ = ['days', 'last_day', 'urls', 'dates']
+
+    def __init__(self):
+        # URL -> day -> [up count, sample count]
+        self.days = {}
+        self.last_day = None
+        # the samples repeat the same URLs and dates: url_or_host -> URL, YYYY-MM-DD -> day
+        self.urls = {}
+        self.dates = {}
+
+    def get_day(self, time) -> int:
+        date = get_utc_date(time.strip()) if isinstance(time, str) else None
+        if date is None:
+            return get_day(time)
+        day = self.dates.get(date)
+        if day is None:
+            day = self.dates[date] = get_day(datetime.date.fromisoformat(date))
+        return day
+
+    def add(self, url_or_host: str, time, status):
+        url = self.urls.get(url_or_host)
+        if url is None:
+            url = self.urls[url_or_host] = get_url(url_or_host)
+        day = self.get_day(time)
+        counts = self.days.setdefault(url, {}).setdefault(day, [0, 0])
+        counts[0] += is_up(status)
+        counts[1] += 1
+        if self.last_day is None or day > self.last_day:
+            self.last_day = day
+
+    def add_records(self, records, url_or_host=None):
+        for record in records:
+            record_url_or_host = url_or_host or record.get('url') or record.get('host')
+            if record_url_or_host is None or record.get('time') is None or record.get('status') is None:
+                raise ValueError(f'the sample has no url (or host), time or status: {record!r}')
+            try:
+                self.add(record_url_or_host, record['time'], record['status'])
+            except ValueError as ex:
+                raise ValueError(f'{ex}: {record!r}') from ex
+
+    def add_file(self, filename: str):
+        """Add the samples of a file, raise a ValueError naming the file and the sample if one is invalid"""
+        try:
+            with open(filename, 'r', encoding='utf-8', newline='') as input_file:
+                if filename.endswith('.csv'):
+                    self.add_records(csv.DictReader(input_file))
+                    return
+                if filename.endswith('.json'):
+                    content = json.load(input_file)
+                else:
+                    content = yaml.load(input_file, Loader=SafeLoader)
+            if isinstance(content, dict):
+                for url_or_host, records in content.items():
+                    self.add_records(records, url_or_host)
+            else:
+                self.add_records(content)
+        except ValueError as ex:
+            raise ValueError(f'{filename}: {ex}') from ex
+
+    def get_uptime(self, url: str, end_day: int = None) -> dict:
+        """Return window -> uptime ratio (None without sample) for the windows ending at end_day (included)"""
+        if end_day is None:
+            end_day = self.last_day
+        max_window = max(WINDOWS)
+        # daily counts of the largest window, the most recent day first
+        daily = [[0, 0] for _ in range(max_window)]
+        for day, counts in self.days.get(url, {}).items():
+            age = end_day - day
+            if 0 <= age < max_window:
+                daily[age] = counts
+        result = {}
+        up_count = sample_count = 0
+        window_iterator = iter(sorted(WINDOWS))
+        window = next(window_iterator)
+        for age, (day_up_count, day_sample_count) in enumerate(daily, start=1):
+            up_count += day_up_count
+            sample_count += day_sample_count
+            if age == window:
+                result[window] = up_count / sample_count if sample_count > 0 else None
+                window = next(window_iterator, None)
+        return result
+
+
+class InstanceUptime:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['url', 'uptime', 'violations']
+
+    def __init__(self, url: str, uptime: dict):
+        self.url = url
+        self.uptime = uptime
+        self.violations = [
+            rule for window, minimum, rule in RULES
+            if uptime.get(window) is not None and uptime[window] < minimum
+        ]
+
+    def __repr__(self):
+        return f'InstanceUptime({self.url!r}, {self.uptime!r})'
+
+
+def get_instance_uptime_list(instance_list: model.InstanceList, aggregator: UptimeAggregator,
+                             end_day: int = None) -> list:
+    """Join the uptime to the instances, using the first URL of the instance with samples"""
+    result = []
+    for url, instance in instance_list.items():
+        uptime = {window: None for window in WINDOWS}
+        for instance_url in instance.get_urls(url):
+            if instance_url in aggregator.days:
+                uptime = aggregator.get_uptime(instance_url, end_day)
+                break
+        result.append(InstanceUptime(url, uptime))
+    return result
+
+
+def format_ratio(ratio) -> str:
+    return '    ?' if ratio is None else f'{100 * ratio:5.1f}'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances uptime',
+                                     description='Compute the 7, 14 and 30 day uptime from status history files.')
+    parser.add_argument('files', nargs='+', help='CSV, JSON or YAML status history files')
+    args = parser.parse_args(argv)
+
+    aggregator = UptimeAggregator()
+    for filename in args.files:
+        aggregator.add_file(filename)
+    instance_uptime_list = get_instance_uptime_list(model.load(), aggregator)
+    print(' '.join(f'{str(window) + "d":>5}' for window in WINDOWS), ' url')
+    for instance_uptime in instance_uptime_list:
+        ratios = ' '.join(format_ratio(instance_uptime.uptime[window]) for window in WINDOWS)
+        violations = ''.join(f'\n      ERROR: {violation}' for violation in instance_uptime.violations)
+        print(f'{ratios}  {instance_uptime.url}{violations}')
+    if any(instance_uptime.violations for instance_uptime in instance_uptime_list):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
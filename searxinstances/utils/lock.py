@@ -0,0 +1,62 @@
+# Advisory lock on a file, shared by the processes editing instances.yml.
+#
+# The lock is taken on a separate lock file, never on the locked data: git
+# replaces instances.yml by a new file on checkout, and on Windows msvcrt
+# locks the first byte of the file, which forbids any other write to it.
+
+
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+
+__all__ = [
+    'lock_file',
+    'LockTimeout',
+]
+
+
+class LockTimeout(RuntimeError):
+    pass
+
+
+def try_lock(fd) -> bool:
+    try:
+        if fcntl is None:  # pragma: no cover
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)  # pylint: disable=used-before-assignment
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+def unlock(fd):
+    if fcntl is None:  # pragma: no cover
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+@contextmanager
+def lock_file(filename: str, timeout: float = 60, interval: float = 0.05):
+    fd = os.open(filename, os.O_RDWR | os.O_CREAT)
+    try:
+        deadline = time.monotonic() + timeout
+        while not try_lock(fd):
+            if time.monotonic() > deadline:
+                raise LockTimeout(f'{filename} is locked by another process')
+            time.sleep(interval)
+        try:
+            yield
+        finally:
+            unlock(fd)
+    finally:
+        os.close(fd)
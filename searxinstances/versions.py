@@ -0,0 +1,205 @@
+"""How far behind the SearXNG master branch are the instances?
+
+The instances report their version in /config, for example `2024.6.30+1e7a2b3a6`.
+The commit is looked up in a local clone of SearXNG: the commit graph is read
+once with a single `git log`, the parents and the generation numbers are
+cached, and the distance to HEAD is computed without one git command per instance.
+"""
+import argparse
+import asyncio
+import bisect
+import heapq
+import json
+import os.path
+import re
+
+import git
+import httpx
+
+from . import model
+
+
+CACHE_FILENAME = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                              'searxinstances', 'commit-graph.json')
+VERSION_RE = re.compile(r'^(\d{4})\.(\d{1,2})\.(\d{1,2})(?:[.-]\d+)?\+([0-9a-f]{7,40})')
+MAX_DAYS_BEHIND = 7
+# the format of the cached commits
+CACHE_VERSION = 2
+
+
+class CommitGraph:
+    """Generation number, commit timestamp and parents of each commit reachable from HEAD
+
+    The generation number of a commit is one more than the highest generation
+    number of its parents: walking the commits by decreasing generation number
+    visits each commit after all its children.
+    """
+
+    __slots__ = ['head', 'commits', 'sorted_shas']
+
+    def __init__(self, head: str, commits: dict):
+        self.head = head
+        self.commits = commits
+        self.sorted_shas = sorted(commits)
+
+    @staticmethod
+    def load(repo_path: str, cache_filename: str = CACHE_FILENAME) -> 'CommitGraph':
+        repo = git.Repo(repo_path)
+        head = repo.head.commit.hexsha
+        cached_head, commits = read_cache(repo_path, cache_filename)
+        if cached_head == head:
+            return CommitGraph(head, commits)
+
+        # only read the commits which are not in the cache
+        revisions = [head]
+        if cached_head is not None and repo.is_ancestor(cached_head, head):
+            revisions.append('^' + cached_head)
+        else:
+            commits = {}
+        output = repo.git.log('--topo-order', '--reverse', '--format=%H %ct %P', *revisions)
+        for line in output.splitlines():
+            sha, timestamp, *parents = line.split()
+            generation = 1 + max((commits[parent][0] for parent in parents if parent in commits), default=0)
+            commits[sha] = [generation, int(timestamp), parents]
+
+        if cache_filename is not None:
+            os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+            with open(cache_filename, 'w', encoding='utf-8') as output_file:
+                json.dump({'version': CACHE_VERSION, 'path': os.path.realpath(repo_path), 'head': head,
+                           'commits': commits}, output_file)
+        return CommitGraph(head, commits)
+
+    def find(self, prefix: str):
+        """Return the full SHA of the commit starting with prefix, None if unknown or ambiguous"""
+        index = bisect.bisect_left(self.sorted_shas, prefix)
+        if index == len(self.sorted_shas) or not self.sorted_shas[index].startswith(prefix):
+            return None
+        if index + 1 < len(self.sorted_shas) and self.sorted_shas[index + 1].startswith(prefix):
+            return None
+        return self.sorted_shas[index]
+
+    def count_commits_behind(self, sha: str) -> int:
+        """Return the number of commits reachable from HEAD but not from sha, like `git rev-list --count sha..HEAD`
+
+        The walk starts from HEAD and sha, a commit is marked as reachable from sha when
+        one of its children is. It stops when all the queued commits are reachable from sha.
+        """
+        reachable_from_sha = {self.head: False, sha: True}
+        queue = [(-self.commits[self.head][0], self.head)]
+        if sha != self.head:
+            heapq.heappush(queue, (-self.commits[sha][0], sha))
+        pending = 0 if sha == self.head else 1
+        count = 0
+        while pending > 0:
+            _, current = heapq.heappop(queue)
+            uninteresting = reachable_from_sha[current]
+            if not uninteresting:
+                pending -= 1
+                count += 1
+            for parent in self.commits[current][2]:
+                if parent not in reachable_from_sha:
+                    reachable_from_sha[parent] = uninteresting
+                    heapq.heappush(queue, (-self.commits[parent][0], parent))
+                    if not uninteresting:
+                        pending += 1
+                elif uninteresting and not reachable_from_sha[parent]:
+                    reachable_from_sha[parent] = True
+                    pending -= 1
+        return count
+
+    def get_distance(self, sha: str):
+        """Return (commits behind, days behind) HEAD"""
+        return self.count_commits_behind(sha), (self.commits[self.head][1] - self.commits[sha][1]) / 86400
+
+
+def read_cache(repo_path: str, cache_filename: str):
+    """Return (cached HEAD, commits), (None, {}) if there is no cache for repo_path"""
+    if cache_filename is None or not os.path.isfile(cache_filename):
+        return None, {}
+    with open(cache_filename, 'r', encoding='utf-8') as input_file:
+        cache = json.load(input_file)
+    if cache.get('version') != CACHE_VERSION or cache.get('path') != os.path.realpath(repo_path):
+        return None, {}
+    return cache['head'], cache['commits']
+
+
+class VersionResult:  # pylint: disable=too-few-public-methods
+
+    __slots__ = ['url', 'version', 'commit', 'commits_behind', 'days_behind', 'error']
+
+    def __init__(self, url: str, version=None, error=None):
+        self.url = url
+        self.version = version
+        self.commit = None
+        self.commits_behind = None
+        self.days_behind = None
+        self.error = error
+
+    def __repr__(self):
+        return f'VersionResult({self.url!r}, version={self.version!r}, days_behind={self.days_behind!r})'
+
+
+async def get_version(client: httpx.AsyncClient, url: str, semaphore: asyncio.Semaphore) -> VersionResult:
+    async with semaphore:
+        try:
+            response = await client.get(url + '/config')
+            response.raise_for_status()
+            return VersionResult(url, version=response.json().get('version'))
+        except (httpx.HTTPError, ValueError, AttributeError) as ex:
+            return VersionResult(url, error=str(ex) or ex.__class__.__name__)
+
+
+async def get_version_list(client: httpx.AsyncClient, url_list: list, concurrency: int = 16) -> list:
+    semaphore = asyncio.Semaphore(concurrency)
+    return await asyncio.gather(*[get_version(client, url, semaphore) for url in url_list])
+
+
+def set_distance(result: VersionResult, commit_graph: CommitGraph):
+    if result.version is None:
+        return
+    match = VERSION_RE.match(result.version)
+    if match is None:
+        result.error = f'unknown version format {result.version}'
+        return
+    result.commit = commit_graph.find(match.group(4))
+    if result.commit is None:
+        result.error = f'commit {match.group(4)} not found'
+        return
+    result.commits_behind, result.days_behind = commit_graph.get_distance(result.commit)
+
+
+def get_staleness_report(version_list: list, commit_graph: CommitGraph) -> list:
+    """Set the distance of each result, return the list sorted by days behind (unknown last)"""
+    for result in version_list:
+        set_distance(result, commit_graph)
+    return sorted(version_list,
+                  key=lambda result: (result.days_behind is None, -(result.days_behind or 0), result.url))
+
+
+async def check_instance_list(instance_list: model.InstanceList, commit_graph: CommitGraph,
+                              concurrency: int = 16, transport=None) -> list:
+    async with httpx.AsyncClient(timeout=10, follow_redirects=True, transport=transport) as client:
+        version_list = await get_version_list(client, list(instance_list.keys()), concurrency)
+    return get_staleness_report(version_list, commit_graph)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='searxinstances versions',
+                                     description='Show how far behind SearXNG master the instances are.')
+    parser.add_argument('searxng_repo', help='Path to an up to date clone of https://github.com/searxng/searxng')
+    parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent HTTP requests')
+    args = parser.parse_args(argv)
+
+    commit_graph = CommitGraph.load(args.searxng_repo)
+    report = asyncio.run(check_instance_list(model.load(), commit_graph, args.concurrency))
+    print(f'{"days":>6} {"commits":>6}  url')
+    for result in report:
+        if result.days_behind is None:
+            print(f'{"?":>6} {"?":>6}  {result.url} ({result.error})')
+        else:
+            flag = '  ERROR' if result.days_behind > MAX_DAYS_BEHIND else ''
+            print(f'{result.days_behind:6.1f} {result.commits_behind:6}  {result.url} {result.version}{flag}')
+
+
+if __name__ == "__main__":
+    main()
@@ -57,6 +57,8 @@ setup(
     package_data={
         'searxinstances': [
             'instances.yml',
+            'public_suffix_list.dat',
+            'hosting_networks.txt',
         ]
     },
     entry_points={
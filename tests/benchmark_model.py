@@ -0,0 +1,49 @@
+"""Memory used by 100k instances, run with `python -m tests.benchmark_model`
+
+The "eager" representation allocates a list and an AdditionalUrlList for each
+instance like the previous versions of the model did.
+"""
+import gc
+import tracemalloc
+
+from searxinstances.model import Instance, AdditionalUrlList
+
+
+COUNT = 100_000
+
+
+def create_eager(index: int) -> Instance:
+    additional_urls = AdditionalUrlList()
+    if index % 10 == 0:
+        additional_urls[f'http://searx{index}.onion'] = ''.join(['Hidden', ' ', 'Service'])
+    return Instance(comments=[], additional_urls=additional_urls)
+
+
+def create_compact(index: int) -> Instance:
+    if index % 10 == 0:
+        additional_urls = AdditionalUrlList()
+        additional_urls[f'http://searx{index}.onion'] = ''.join(['Hidden', ' ', 'Service'])
+        return Instance(additional_urls=additional_urls)
+    return Instance()
+
+
+def measure(create) -> int:
+    gc.collect()
+    tracemalloc.start()
+    instances = {f'https://searx{index}.example.com': create(index) for index in range(COUNT)}
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del instances
+    return current
+
+
+def main():
+    eager = measure(create_eager)
+    compact = measure(create_compact)
+    print(f'{COUNT} instances')
+    print(f'eager:   {eager / 1024 / 1024:8.1f} MiB')
+    print(f'compact: {compact / 1024 / 1024:8.1f} MiB ({100 * (eager - compact) / eager:.0f}% less)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import sqlite3
+
+from searxinstances import model, export
+
+
+CONTENT = '''https://a.example.com:
+  comments:
+  - first
+  - second
+  additional_urls:
+    http://aexample.onion: Hidden Service
+https://b.example.com: {}
+https://c.example.com: {}
+'''
+
+
+def query(filename, sql):
+    connection = sqlite3.connect(filename)
+    try:
+        return connection.execute(sql).fetchall()
+    finally:
+        connection.close()
+
+
+def test_export_sqlite(tmp_path):
+    filename = str(tmp_path / 'instances.db')
+    assert export.export_sqlite(model.yaml_load(CONTENT), filename) == (3, 0)
+    assert query(filename, 'SELECT url, host, tld, network FROM instances ORDER BY url') == [
+        ('https://a.example.com', 'a.example.com', 'com', 'normal'),
+        ('https://b.example.com', 'b.example.com', 'com', 'normal'),
+        ('https://c.example.com', 'c.example.com', 'com', 'normal'),
+    ]
+    assert query(filename, 'SELECT instance_url, label, network FROM additional_urls') == [
+        ('https://a.example.com', 'Hidden Service', 'tor')
+    ]
+    assert query(filename, 'SELECT comment FROM comments ORDER BY position') == [('first',), ('second',)]
+
+    # nothing has changed
+    assert export.export_sqlite(model.yaml_load(CONTENT), filename) == (0, 0)
+
+    # the onion URL moves to b.example.com, c.example.com is removed
+    instance_list = model.yaml_load('''https://a.example.com: {}
+https://b.example.com:
+  additional_urls:
+    http://aexample.onion: Hidden Service
+''')
+    assert export.export_sqlite(instance_list, filename) == (2, 1)
+    assert query(filename, 'SELECT url FROM instances ORDER BY url') == [
+        ('https://a.example.com',), ('https://b.example.com',)
+    ]
+    assert query(filename, 'SELECT instance_url FROM additional_urls') == [('https://b.example.com',)]
+    assert query(filename, 'SELECT count(*) FROM comments') == [(0,)]
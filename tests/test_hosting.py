@@ -0,0 +1,58 @@
+import pytest
+
+from searxinstances import model, hosting
+
+
+@pytest.fixture
+def prefix_tree():
+    tree = hosting.PrefixTree()
+    tree.add('104.16.0.0/13', 'cloudflare')
+    tree.add('104.16.1.0/24', 'other')
+    tree.add('2606:4700::/32', 'cloudflare')
+    return tree
+
+
+@pytest.mark.parametrize('address,expected', [
+    ('104.16.0.1', 'cloudflare'),
+    ('104.23.255.255', 'cloudflare'),
+    ('104.24.0.0', None),
+    ('104.16.1.1', 'other'),
+    ('2606:4700::6810:84e5', 'cloudflare'),
+    ('2606:4701::1', None),
+    ('127.0.0.1', None),
+])
+def test_prefix_tree(prefix_tree, address, expected):
+    assert prefix_tree.get(address) == expected
+
+
+def test_load_prefix_tree():
+    prefix_tree = hosting.load_prefix_tree()
+    assert prefix_tree.get('104.16.132.229') == 'cloudflare'
+    assert prefix_tree.get('151.101.1.69') == 'fastly'
+    assert prefix_tree.get('9.9.9.9') is None
+
+
+@pytest.mark.asyncio
+async def test_check_instance_list(prefix_tree):
+    instance_list = model.yaml_load('''https://proxied.example.com: {}
+https://searx.example.com:
+  additional_urls:
+    http://searxexample.onion: Hidden Service
+https://unknown.example.com: {}
+''')
+    dns = {
+        'proxied.example.com': ['104.16.2.3', '2001:db8::1'],
+        'searx.example.com': ['192.0.2.1'],
+    }
+
+    async def resolver(host):
+        if host not in dns:
+            raise OSError('Name or service not known')
+        return dns[host]
+
+    result_list = await hosting.check_instance_list(instance_list, prefix_tree, resolver=resolver)
+    results = {result.url: result for result in result_list}
+    assert set(results) == {'https://proxied.example.com', 'https://searx.example.com', 'https://unknown.example.com'}
+    assert results['https://proxied.example.com'].providers == {'104.16.2.3': 'cloudflare'}
+    assert results['https://searx.example.com'].providers == {}
+    assert results['https://unknown.example.com'].error == 'Name or service not known'
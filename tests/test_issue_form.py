@@ -0,0 +1,61 @@
+import io
+
+import pytest
+
+from searxinstances import issue_form
+
+
+BODY = '''### Requirements (make sure to read all of them)
+
+- [X] This is my instance. I bought and own this domain myself. Shared domains (e.g. noip.com, eu.org) are not allowed.
+- [ ] I'll keep my instance up to date (no more than 1 week behind). Examples: watchtower, cron, diun, wud.
+
+### Bot protection
+
+- [x] Yes I have configured the `server.public_instance` parameter.
+
+### Matrix username
+
+@foobar:matrix.org
+
+### Alternate source code
+
+_No response_
+
+### Comment
+
+<!-- a comment --> Hosted at home.
+<!-- ### Not a heading
+-->
+'''
+
+
+def test_parse():
+    form = issue_form.parse(BODY)
+    assert list(form.sections.keys()) == [
+        'Requirements (make sure to read all of them)', 'Bot protection', 'Matrix username',
+        'Alternate source code', 'Comment'
+    ]
+    assert len(form.checkboxes) == 3
+    assert form.unchecked == [
+        "I'll keep my instance up to date (no more than 1 week behind). Examples: watchtower, cron, diun, wud."
+    ]
+    assert form.matrix_username == '@foobar:matrix.org'
+    assert form.source_code_url is None
+    assert form.comment == 'Hosted at home.'
+
+
+@pytest.mark.parametrize('text,expected', [
+    ('a<!-- b -->c<!-- d -->e', 'ace'),
+    ('a<!-- b', 'a<!-- b'),
+    ('a<!-- b -->c-->', 'ac-->'),
+    ('', ''),
+])
+def test_remove_comments(text, expected):
+    assert issue_form.remove_comments(text) == expected
+
+
+def test_main(monkeypatch, capsys):
+    monkeypatch.setattr('sys.stdin', io.StringIO(BODY))
+    issue_form.main(['--field', 'matrix_username'])
+    assert capsys.readouterr().out == '@foobar:matrix.org\n'
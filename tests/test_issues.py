@@ -0,0 +1,103 @@
+import httpx
+import pytest
+
+from searxinstances import model, update
+from searxinstances.issues import IssueMirror, GITHUB_ISSUES_URL
+
+
+def make_issue(number, updated_at, labels=('instance', 'instance add'), state='open', body=''):
+    return {
+        'number': number,
+        'title': f'Add https://searx{number}.example.com',
+        'body': body,
+        'state': state,
+        'user': {'login': 'user'},
+        'html_url': f'https://github.com/searxng/searx-instances/issues/{number}',
+        'updated_at': updated_at,
+        'labels': [{'name': name} for name in labels],
+    }
+
+
+class GithubTransport(httpx.MockTransport):
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.requests = []
+        super().__init__(self.handle)
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        page = int(request.url.params.get('page', '1'))
+        headers = {}
+        if page < len(self.pages):
+            headers['Link'] = f'<{GITHUB_ISSUES_URL}?state=all&page={page + 1}>; rel="next"'
+        return httpx.Response(200, json=self.pages[page - 1], headers=headers)
+
+
+@pytest.fixture
+def issue_mirror():
+    with IssueMirror(':memory:') as mirror:
+        yield mirror
+
+
+def test_sync_pages(issue_mirror):
+    transport = GithubTransport([
+        [make_issue(1, '2024-01-01T00:00:00Z', state='closed', body='I have a Cloudflare proxy'),
+         make_issue(2, '2024-01-02T00:00:00Z', labels=('bug',))],
+        [make_issue(3, '2024-01-03T00:00:00Z')],
+    ])
+    with httpx.Client(transport=transport) as client:
+        assert issue_mirror.sync(client) == 3
+    assert len(transport.requests) == 2
+    assert 'since' not in transport.requests[0].url.params
+    assert issue_mirror.since == '2024-01-03T00:00:00Z'
+    assert [issue['number'] for issue in issue_mirror.get_issue_list()] == [3]
+    assert [issue['number'] for issue in issue_mirror.get_issue_list(state=None)] == [3, 1]
+    assert issue_mirror.search('cloudflare') == [1]
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('searx1.example.com', [1]),
+    ('https://searx2.example.com', [2]),
+    ('searx3.example.com', []),
+    ('"searx1', [1]),
+])
+def test_search(issue_mirror, query, expected):
+    with httpx.Client(transport=GithubTransport([[make_issue(1, '2024-01-01T00:00:00Z'),
+                                                  make_issue(2, '2024-01-02T00:00:00Z')]])) as client:
+        issue_mirror.sync(client)
+    assert issue_mirror.search(query) == expected
+
+
+def test_load_user_request_list(issue_mirror):
+    transport = GithubTransport([[
+        make_issue(1, '2024-01-01T00:00:00Z'),
+        make_issue(2, '2024-01-02T00:00:00Z', labels=('instance', 'instance delete')),
+        make_issue(3, '2024-01-03T00:00:00Z', labels=('instance', 'instance add', 'instance edit')),
+        make_issue(4, '2024-01-04T00:00:00Z', state='closed', body='Already submitted in searx1.example.com'),
+    ]])
+    with httpx.Client(transport=transport) as client:
+        issue_mirror.sync(client)
+    user_request_list = update.load_user_request_list_from_github([], offline=True, issue_mirror=issue_mirror)
+    assert [(user_request.__class__, user_request.request_id, user_request.url)
+            for user_request in user_request_list] == [
+        (update.UserRequestDelete, 2, 'https://searx2.example.com'),
+        (update.UserRequestAdd, 1, 'https://searx1.example.com'),
+    ]
+    assert user_request_list[1].request_url == 'https://github.com/searxng/searx-instances/issues/1'
+    assert user_request_list[1].related_issues == [4]
+    assert 'issue #4 mentions searx1.example.com' in user_request_list[1].get_checks(model.InstanceList())
+    assert update.load_user_request_list_from_github([1], offline=True, issue_mirror=issue_mirror)[0].url ==\
+        'https://searx1.example.com'
+
+
+def test_sync_since(issue_mirror):
+    with httpx.Client(transport=GithubTransport([[make_issue(1, '2024-01-01T00:00:00Z')]])) as client:
+        issue_mirror.sync(client)
+    # the label has been removed
+    transport = GithubTransport([[make_issue(1, '2024-02-01T00:00:00Z', labels=('invalid',))]])
+    with httpx.Client(transport=transport) as client:
+        issue_mirror.sync(client)
+    assert transport.requests[0].url.params['since'] == '2024-01-01T00:00:00Z'
+    assert issue_mirror.get_issue_list(state=None) == []
+    assert issue_mirror.search('searx1') == []
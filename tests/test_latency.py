@@ -0,0 +1,68 @@
+import asyncio
+import random
+
+import httpx
+import pytest
+
+from searxinstances import latency
+
+
+@pytest.mark.parametrize('value', [0, 1, 31, 32, 33, 63, 64, 65, 1000, 123456, 10 ** 9])
+def test_histogram_bucket(value):
+    index = latency.LogHistogram.get_index(value)
+    lowest = latency.LogHistogram.get_value(index)
+    assert lowest <= value
+    assert value - lowest <= value / latency.SUB_BUCKET_COUNT
+    assert latency.LogHistogram.get_index(lowest) == index
+
+
+def test_histogram_percentile():
+    histogram = latency.LogHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+    assert histogram.total == 100
+    assert histogram.percentile(50) == 50
+    assert histogram.percentile(100) == 100
+
+
+def test_mann_whitney():
+    fast, slow = latency.LogHistogram(), latency.LogHistogram()
+    for value in range(10):
+        fast.record(1000 + value)
+        slow.record(20000 + value)
+    assert latency.mann_whitney_less(fast, slow) < 0.001
+    assert latency.mann_whitney_less(slow, fast) > 0.999
+    assert 0.3 < latency.mann_whitney_less(fast, fast) < 0.7
+
+
+def make_transport(cache: bool):
+    seen_queries = set()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        query = request.url.params['q']
+        if cache and query in seen_queries:
+            await asyncio.sleep(0.001)
+        else:
+            await asyncio.sleep(random.uniform(0.02, 0.03))
+        seen_queries.add(query)
+        return httpx.Response(200, text='results')
+
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('cache', [False, True])
+async def test_measure_instance(cache):
+    async with httpx.AsyncClient(transport=make_transport(cache)) as client:
+        result = await latency.measure_instance(client, 'https://searx.example.com', sample_count=8, rate=200)
+    assert result.repeated.total == 8
+    assert result.unique.total == 8
+    assert result.errors == 0
+    assert result.is_suspicious() == cache
+
+
+@pytest.mark.asyncio
+async def test_check_url_list():
+    url_list = ['https://a.example.com', 'https://b.example.com']
+    result_list = await latency.check_url_list(url_list, sample_count=2, rate=200, transport=make_transport(False))
+    assert [result.url for result in result_list] == url_list
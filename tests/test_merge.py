@@ -0,0 +1,97 @@
+import pytest
+
+from searxinstances import model, merge
+from searxinstances.utils import lock
+
+
+BASE = '''https://a.example.com: {}
+https://b.example.com: {}
+https://c.example.com: {}
+'''
+
+OURS = '''https://a.example.com:
+  comments:
+  - ours
+https://c.example.com: {}
+https://d.example.com: {}
+'''
+
+THEIRS = '''https://a.example.com: {}
+https://b.example.com: {}
+https://c.example.com:
+  comments:
+  - theirs
+https://e.example.com: {}
+'''
+
+
+def test_merge():
+    merged, conflicts = merge.merge(model.yaml_load(BASE), model.yaml_load(OURS), model.yaml_load(THEIRS))
+    assert not conflicts
+    assert model.yaml_dump(merged) == '''https://a.example.com:
+  comments:
+  - ours
+https://c.example.com:
+  comments:
+  - theirs
+https://d.example.com: {}
+https://e.example.com: {}
+'''
+
+
+def test_merge_conflict():
+    ours = model.yaml_load(OURS + 'https://f.example.com:\n  additional_urls:\n    http://f.onion: Hidden Service\n')
+    theirs = model.yaml_load(BASE.replace('https://a.example.com: {}', 'https://a.example.com:\n  analytics: true')
+                             + 'https://g.example.com:\n  additional_urls:\n    http://f.onion: Hidden Service\n')
+    merged, conflicts = merge.merge(model.yaml_load(BASE), ours, theirs)
+    assert [(conflict.url, conflict.reason) for conflict in conflicts] == [
+        ('https://a.example.com', 'changed on both sides'),
+        ('https://g.example.com', 'http://f.onion already declared'),
+    ]
+    assert merged['https://a.example.com'].comments == ['ours']
+    assert 'https://g.example.com' not in merged
+
+
+def test_merge_files(tmp_path):
+    base_filename = str(tmp_path / 'base.yml')
+    our_filename = str(tmp_path / 'ours.yml')
+    their_filename = str(tmp_path / 'theirs.yml')
+    for filename, content in ((base_filename, BASE), (our_filename, OURS),
+                              (their_filename, THEIRS.replace('theirs', 'ours'))):
+        with open(filename, 'w', encoding='utf-8') as output_file:
+            output_file.write(content)
+    assert not merge.merge_files(base_filename, our_filename, their_filename)
+    assert model.load(our_filename)['https://c.example.com'].comments == ['ours']
+
+
+def test_lock_file(tmp_path):
+    filename = str(tmp_path / 'instances.yml')
+    with lock.lock_file(filename):
+        with pytest.raises(lock.LockTimeout):
+            with lock.lock_file(filename, timeout=0.1):
+                pass
+    with lock.lock_file(filename, timeout=0.1):
+        pass
+
+
+def test_merge_files_conflict(tmp_path):
+    base_filename = str(tmp_path / 'base.yml')
+    our_filename = str(tmp_path / 'ours.yml')
+    their_filename = str(tmp_path / 'theirs.yml')
+    theirs = THEIRS.replace('https://a.example.com: {}', 'https://a.example.com:\n  analytics: true')
+    for filename, content in ((base_filename, BASE), (our_filename, OURS), (their_filename, theirs)):
+        with open(filename, 'w', encoding='utf-8') as output_file:
+            output_file.write(content)
+    assert [conflict.url for conflict in merge.merge_files(base_filename, our_filename, their_filename)] == [
+        'https://a.example.com'
+    ]
+    with open(our_filename, 'r', encoding='utf-8') as input_file:
+        assert input_file.read().endswith('''<<<<<<< ours (changed on both sides)
+https://a.example.com:
+  comments:
+  - ours
+=======
+https://a.example.com:
+  analytics: true
+>>>>>>> theirs
+''')
@@ -0,0 +1,47 @@
+import pytest
+
+from searxinstances import model
+
+
+CONTENT = '''https://searx.be: {}
+https://searx.me:
+  comments:
+  - a comment
+  additional_urls:
+    http://searxme.onion: Hidden Service
+'''
+
+
+def test_yaml_round_trip():
+    instance_list = model.yaml_load(CONTENT)
+    assert model.yaml_dump(instance_list) == CONTENT
+
+
+def test_empty_attributes_are_allocated_on_access():
+    instance = model.Instance()
+    assert instance.get_urls('https://searx.be') == ['https://searx.be']
+    assert instance.to_json() == {'analytics': False, 'comments': [], 'additional_urls': {}, 'git_url': None}
+    instance.comments.append('a comment')
+    instance.additional_urls['http://searxbe.onion'] = 'Hidden Service'
+    assert instance.comments == ['a comment']
+    assert instance.get_urls('https://searx.be') == ['https://searx.be', 'http://searxbe.onion']
+    assert model.Instance().comments == []
+
+
+def test_labels_are_interned():
+    first, second = model.AdditionalUrlList(), model.AdditionalUrlList()
+    first['http://searxbe.onion'] = ''.join(['Hidden', ' ', 'Service'])
+    second['http://searxme.onion'] = ''.join(['Hidden', ' ', 'Service'])
+    assert first['http://searxbe.onion'] is second['http://searxme.onion']
+
+
+def test_duplicate_url():
+    instance_list = model.yaml_load(CONTENT)
+    with pytest.raises(ValueError):
+        instance_list['http://searxme.onion'] = model.Instance()
+
+
+def test_json_dump():
+    instance_list = model.yaml_load(CONTENT)
+    assert instance_list['https://searx.be'].json_dump() == model.Instance().json_dump()
+    assert instance_list['https://searx.me'].json_dump() != model.Instance().json_dump()
@@ -0,0 +1,57 @@
+import pytest
+
+from searxinstances import model, publicsuffix
+
+
+PUBLIC_SUFFIX_LIST = publicsuffix.PublicSuffixList('''
+// ===BEGIN ICANN DOMAINS===
+com
+uk
+co.uk
+cn
+公司.cn
+straße.de
+*.ck
+!www.ck
+// ===END ICANN DOMAINS===
+// ===BEGIN PRIVATE DOMAINS===
+eu.org
+ddns.net
+// ===END PRIVATE DOMAINS===
+''')
+
+
+@pytest.mark.parametrize('host,suffix,private,registrable_domain', [
+    ('searx.com', 'com', False, 'searx.com'),
+    ('a.searx.com', 'com', False, 'searx.com'),
+    ('searx.co.uk', 'co.uk', False, 'searx.co.uk'),
+    ('co.uk', 'co.uk', False, None),
+    ('searx.a.ck', 'a.ck', False, 'searx.a.ck'),
+    ('a.ck', 'a.ck', False, None),
+    ('www.ck', 'ck', False, 'www.ck'),
+    ('searx.eu.org', 'eu.org', True, 'searx.eu.org'),
+    ('SEARX.DDNS.NET', 'ddns.net', True, 'searx.ddns.net'),
+    ('searx.unknown', 'unknown', False, 'searx.unknown'),
+    ('searx.xn--55qx5d.cn', 'xn--55qx5d.cn', False, 'searx.xn--55qx5d.cn'),
+    ('xn--55qx5d.cn', 'xn--55qx5d.cn', False, None),
+    ('searx.xn--strae-oqa.de', 'xn--strae-oqa.de', False, 'searx.xn--strae-oqa.de'),
+])
+def test_public_suffix(host, suffix, private, registrable_domain):
+    public_suffix = PUBLIC_SUFFIX_LIST.get_public_suffix(host)
+    assert public_suffix.suffix == suffix
+    assert public_suffix.private == private
+    assert PUBLIC_SUFFIX_LIST.get_registrable_domain(host) == registrable_domain
+
+
+def test_instance_list():
+    instance_list = model.yaml_load('''https://a.searx.me: {}
+https://b.searx.me: {}
+https://searx.eu.org:
+  additional_urls:
+    http://searxeuorg.onion: Hidden Service
+https://searx.be: {}
+''')
+    assert publicsuffix.get_shared_domain_errors(instance_list) == ['https://searx.eu.org: eu.org is a shared domain']
+    assert publicsuffix.get_same_owner_clusters(instance_list) == {
+        'searx.me': ['https://a.searx.me', 'https://b.searx.me']
+    }
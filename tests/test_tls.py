@@ -0,0 +1,123 @@
+import os.path
+import socket
+import ssl
+import threading
+
+import pytest
+
+from searxinstances import model, tls
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+CERT_FILENAME = os.path.join(DATA_DIR, 'localhost.crt')
+KEY_FILENAME = os.path.join(DATA_DIR, 'localhost.key')
+
+
+@pytest.fixture
+def tls_server():
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(CERT_FILENAME, KEY_FILENAME)
+    server_socket = socket.create_server(('127.0.0.1', 0))
+    server_socket.settimeout(0.05)
+    connection_count = [0]
+    stop = threading.Event()
+
+    def serve():
+        while not stop.is_set():
+            try:
+                sock, _ = server_socket.accept()
+            except socket.timeout:
+                continue
+            sock.settimeout(5)
+            connection_count[0] += 1
+            try:
+                with context.wrap_socket(sock, server_side=True):
+                    pass
+            except (OSError, ssl.SSLError):
+                pass
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield server_socket.getsockname()[1], connection_count
+    stop.set()
+    thread.join(timeout=5)
+    server_socket.close()
+
+
+@pytest.fixture
+def scanner():
+    return tls.TlsScanner(ssl.create_default_context(cafile=CERT_FILENAME), timeout=5)
+
+
+def test_scan(tls_server, scanner):
+    port, _ = tls_server
+    result = scanner.scan('localhost', port)
+    assert result.error is None
+    assert result.issuer == 'searxinstances tests'
+    assert result.san == ['localhost', '127.0.0.1']
+    assert result.san_covers_host
+    assert result.protocol in ('TLSv1.2', 'TLSv1.3')
+    assert result.days_before_expiry > 365
+    assert result.get_errors() == []
+
+
+def test_scan_untrusted(tls_server):
+    port, _ = tls_server
+    result = tls.TlsScanner(timeout=5).scan('localhost', port)
+    assert 'certificate verify failed' in result.error
+    assert result.get_errors() == [result.error]
+
+
+@pytest.mark.parametrize('pattern,host,expected', [
+    ('searx.example.com', 'searx.example.com', True),
+    ('SEARX.example.com', 'searx.example.com.', True),
+    ('*.example.com', 'searx.example.com', True),
+    ('*.example.com', 'a.searx.example.com', False),
+    ('*.example.com', 'example.com', False),
+])
+def test_match_host(pattern, host, expected):
+    assert tls.match_host(pattern, host) == expected
+
+
+def test_scan_cache(tls_server, scanner, tmp_path):
+    port, connection_count = tls_server
+    cache_filename = str(tmp_path / 'tls.json')
+    result_list = tls.scan([('localhost', port)], scanner, tls.TlsCache(cache_filename))
+    assert result_list[0].error is None
+    assert connection_count[0] == 1
+    # the cached result is still valid
+    protocol = result_list[0].protocol
+    result_list = tls.scan([('localhost', port)], scanner, tls.TlsCache(cache_filename))
+    assert result_list[0].protocol == protocol
+    assert connection_count[0] == 1
+    # the cached result has expired
+    tls.scan([('localhost', port)], scanner, tls.TlsCache(cache_filename, ttl=0))
+    assert connection_count[0] == 2
+
+
+def test_get_host_port_list():
+    instance_list = model.yaml_load('''https://a.example.com:
+  additional_urls:
+    http://aexample.onion: Hidden Service
+    https://a.example.com/searxng: Alternative path
+https://b.example.com:8443: {}
+''')
+    assert tls.get_host_port_list(instance_list) == [('a.example.com', 443), ('b.example.com', 8443)]
+
+
+def test_cache_older_fields(tmp_path):
+    cache_filename = tmp_path / 'tls.json'
+    cache_filename.write_text('{"localhost:443": {"host": "localhost", "port": 443, "protocol": "TLSv1.3", '
+                              '"session_reused": false}}', encoding='utf-8')
+    assert tls.TlsCache(str(cache_filename)).results['localhost:443'].protocol == 'TLSv1.3'
+
+
+def test_scan_cache_error(tmp_path):
+    # nothing listens on the port of a closed socket
+    with socket.create_server(('127.0.0.1', 0)) as server_socket:
+        port = server_socket.getsockname()[1]
+    cache = tls.TlsCache(str(tmp_path / 'tls.json'))
+    result_list = tls.scan([('127.0.0.1', port)], tls.TlsScanner(timeout=5), cache)
+    assert result_list[0].error is not None
+    assert cache.get('127.0.0.1', port) is None
+    assert not tls.TlsCache(str(tmp_path / 'tls.json')).results
@@ -1,5 +1,10 @@
+import threading
+import time
+
 import pytest
+import git
 import searxinstances.update
+import searxinstances.utils.lock
 
 
 @pytest.mark.parametrize('url,expected', [
@@ -23,3 +28,244 @@ import searxinstances.update
     ])
 def test_normalize_url(url, expected):
     assert searxinstances.update.normalize_url(url) == expected
+
+
+@pytest.fixture
+def git_repo(tmp_path):
+    repo = git.Repo.init(tmp_path)
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@example.com')
+    file_name = str(tmp_path / 'instances.yml')
+    with open(file_name, 'w', encoding='utf-8') as output_file:
+        output_file.write('https://searx.me: {}\n')
+    repo.index.add(['instances.yml'])
+    repo.index.commit('initial commit')
+    return repo, file_name
+
+
+def test_git_commit_context_commit(git_repo):
+    repo, file_name = git_repo
+    with searxinstances.update.GitCommitContext(repo, [file_name]) as git_commit:
+        with open(file_name, 'a', encoding='utf-8') as output_file:
+            output_file.write('https://searx.be: {}\n')
+        git_commit.commit('Add https://searx.be')
+    assert repo.head.commit.message == 'Add https://searx.be'
+    content = (repo.head.commit.tree / 'instances.yml').data_stream.read()
+    assert content == b'https://searx.me: {}\nhttps://searx.be: {}\n'
+    assert not repo.is_dirty()
+
+
+def test_git_commit_context_cancel(git_repo):
+    repo, file_name = git_repo
+    head = repo.head.commit
+    with searxinstances.update.GitCommitContext(repo, [file_name]):
+        with open(file_name, 'a', encoding='utf-8') as output_file:
+            output_file.write('https://searx.be: {}\n')
+    assert repo.head.commit == head
+    assert not repo.is_dirty()
+
+
+def test_git_commit_context_dirty(git_repo):
+    repo, file_name = git_repo
+    with open(file_name, 'a', encoding='utf-8') as output_file:
+        output_file.write('https://searx.be: {}\n')
+    with pytest.raises(ValueError):
+        with searxinstances.update.GitCommitContext(repo, [file_name]):
+            pass
+
+
+def test_user_request_run(monkeypatch):
+    instance_list = searxinstances.model.yaml_load('https://searx.me/searxng: {}\n')
+    user_request = searxinstances.update.UserRequestAdd(1, None, 'user', 'https://searx.me', 'message')
+    contents = []
+
+    def call_editor(content, error_msg):
+        contents.append((content, error_msg))
+        return content
+
+    def apply(instance_list_update, commit_message):
+        if len(contents) == 1:
+            raise ValueError('conflict')
+        assert commit_message.startswith('Add https://searx.me\n')
+        instance_list_update.update(instance_list)
+        return instance_list_update
+
+    monkeypatch.setattr(searxinstances.update, 'call_editor', call_editor)
+    result = user_request.run(instance_list, apply, ['history: 1234567 2024-01-01 Delete https://searx.me'])
+    assert list(result.keys()) == ['https://searx.me', 'https://searx.me/searxng']
+    assert [error_msg for _, error_msg in contents] == [None, 'conflict']
+    assert '#> https://searx.me/searxng is on the same host\n' in contents[0][0]
+    assert '#> history: 1234567 2024-01-01 Delete https://searx.me\n' in contents[0][0]
+
+
+def test_apply_user_request_conflict(git_repo, monkeypatch):
+    repo, file_name = git_repo
+    monkeypatch.setattr(searxinstances.model, 'FILENAME', file_name)
+    update = searxinstances.update
+    instance_list = searxinstances.model.load(file_name)
+
+    # another reviewer adds a comment while the buffer is edited
+    error_msgs = []
+
+    def call_editor(content, error_msg):
+        if not error_msgs:
+            other = update.UserRequestEdit(1, None, 'other', 'https://searx.me', 'message')
+            other.base_entry = instance_list['https://searx.me'].json_dump()
+            other_update = searxinstances.model.yaml_load('https://searx.me:\n  comments:\n  - a comment\n')
+            update.apply_user_request(repo, other, other_update, 'Edit https://searx.me')
+        error_msgs.append(error_msg)
+        return content
+
+    def apply(instance_list_update, commit_message):
+        return update.apply_user_request(repo, user_request, instance_list_update, commit_message)
+
+    monkeypatch.setattr(update, 'call_editor', call_editor)
+    user_request = update.UserRequestEdit(2, None, 'user', 'https://searx.me', 'message')
+    user_request.run(instance_list, apply)
+    assert error_msgs[0] is None
+    assert error_msgs[1].startswith('https://searx.me has been changed by another reviewer')
+    assert '- a comment' in error_msgs[1]
+    # the reviewer has seen the change and saved the buffer again
+    assert len(error_msgs) == 2
+    assert len(list(repo.iter_commits())) == 3
+    assert not repo.is_dirty()
+
+
+def test_apply_user_request_removed(git_repo, monkeypatch):
+    repo, file_name = git_repo
+    monkeypatch.setattr(searxinstances.model, 'FILENAME', file_name)
+    update = searxinstances.update
+    base_entry = searxinstances.model.load(file_name)['https://searx.me'].json_dump()
+    user_request_list = [update.UserRequestDelete(i, None, 'user', 'https://searx.me', 'message') for i in range(2)]
+    for user_request in user_request_list:
+        user_request.base_entry = base_entry
+    update.apply_user_request(repo, user_request_list[0], searxinstances.model.InstanceList(), 'Delete')
+    with pytest.raises(ValueError, match='has been removed by another reviewer'):
+        update.apply_user_request(repo, user_request_list[1], searxinstances.model.InstanceList(), 'Delete')
+    with pytest.raises(ValueError, match='is not in the instance list'):
+        update.apply_user_request(repo, user_request_list[1], searxinstances.model.InstanceList(), 'Delete')
+    assert len(list(repo.iter_commits())) == 2
+    assert not repo.is_dirty()
+
+
+def test_git_commit_context_autocrlf(git_repo):
+    repo, file_name = git_repo
+    with repo.config_writer() as config:
+        config.set_value('core', 'autocrlf', 'true')
+    # the worktree has CRLF line endings, git status is clean
+    with open(file_name, 'wb') as output_file:
+        output_file.write(b'https://searx.me: {}\r\n')
+    assert not repo.is_dirty()
+    with searxinstances.update.GitCommitContext(repo, [file_name]) as git_commit:
+        with open(file_name, 'ab') as output_file:
+            output_file.write(b'https://searx.be: {}\r\n')
+        git_commit.commit('Add https://searx.be')
+    content = (repo.head.commit.tree / 'instances.yml').data_stream.read()
+    assert content == b'https://searx.me: {}\nhttps://searx.be: {}\n'
+    assert not repo.is_dirty()
+
+
+def test_run_user_request_list_while_locked(git_repo, monkeypatch):
+    repo, file_name = git_repo
+    monkeypatch.setattr(searxinstances.model, 'FILENAME', file_name)
+    monkeypatch.setattr(searxinstances.update, 'get_git_repo', lambda: repo)
+    monkeypatch.setattr(searxinstances.update, 'call_editor', lambda content, error_msg: '')
+    locked = threading.Event()
+
+    def other_reviewer():
+        # between model.save() and the commit of another reviewer
+        with searxinstances.utils.lock.lock_file(searxinstances.update.get_lock_filename(repo)):
+            with open(file_name, 'a', encoding='utf-8') as output_file:
+                output_file.write('https://searx.be: {}\n')
+            locked.set()
+            time.sleep(0.2)
+            repo.index.add(['instances.yml'])
+            repo.index.commit('Add https://searx.be')
+
+    thread = threading.Thread(target=other_reviewer)
+    thread.start()
+    locked.wait()
+    user_request = searxinstances.update.UserRequestDelete(None, None, None, 'http://searxexample.onion', '')
+    searxinstances.update.run_user_request_list(searxinstances.model.load(file_name), [user_request])
+    thread.join()
+    assert not repo.is_dirty()
+
+
+def test_prepare_errors(git_repo, monkeypatch):
+    repo, file_name = git_repo
+    monkeypatch.setattr(searxinstances.model, 'FILENAME', file_name)
+    user_request = searxinstances.update.UserRequestDelete(None, None, None, 'https://a..b', '')
+    checks = user_request.prepare(repo.working_tree_dir)
+    assert len(checks) == 1
+    assert checks[0].startswith('https://a..b: UnicodeError')
+
+
+def test_run_user_request_list_prefetch(git_repo, monkeypatch):
+    repo, file_name = git_repo
+    monkeypatch.setattr(searxinstances.model, 'FILENAME', file_name)
+    monkeypatch.setattr(searxinstances.update, 'get_git_repo', lambda: repo)
+    prepared = []
+    checks_list = []
+
+    def prepare(self, repo_path):
+        assert repo_path == repo.working_tree_dir
+        prepared.append(self.url)
+        return [f'checked {self.url}']
+
+    def run(_self, instance_list, _apply, checks=None):
+        checks_list.append(checks)
+        # cancel the second request
+        return None if len(checks_list) == 2 else instance_list
+
+    monkeypatch.setattr(searxinstances.update.UserRequest, 'prepare', prepare)
+    monkeypatch.setattr(searxinstances.update.UserRequest, 'run', run)
+    user_request_list = [
+        searxinstances.update.UserRequestDelete(None, None, None, f'https://searx{index}.example.com', '')
+        for index in range(4)
+    ]
+    searxinstances.update.run_user_request_list(searxinstances.model.InstanceList(), user_request_list, prefetch=1)
+    assert checks_list == [['checked https://searx0.example.com'], ['checked https://searx1.example.com']]
+    # the checks of the third request may have started before the cancel, the fourth one is never submitted
+    assert prepared[:2] == ['https://searx0.example.com', 'https://searx1.example.com']
+    assert 'https://searx3.example.com' not in prepared
+    with pytest.raises(ValueError):
+        searxinstances.update.run_user_request_list(searxinstances.model.InstanceList(), user_request_list, -1)
+
+
+def test_issue_form_checks(monkeypatch):
+    body = ('### Requirements\n\n'
+            '- [X] This is my instance.\n'
+            "- [ ] I'll keep my instance up to date.\n\n"
+            '### Alternate source code\n\n'
+            'https://git.example.com/searxng\n')
+    user_request = searxinstances.update.get_user_request({
+        'number': 1,
+        'title': 'Add https://searx.example.com',
+        'body': body,
+        'html_url': 'https://github.com/searxng/searx-instances/issues/1',
+        'user': {'login': 'user'},
+        'labels': [{'name': 'instance'}, {'name': 'instance add'}],
+    })
+    contents = []
+
+    def call_editor(content, _error_msg):
+        contents.append(content)
+        return ''
+
+    monkeypatch.setattr(searxinstances.update, 'call_editor', call_editor)
+    assert user_request.run(searxinstances.model.InstanceList(), None) is None
+    assert "#> unchecked: I'll keep my instance up to date.\n" in contents[0]
+    assert '#> source code: https://git.example.com/searxng\n' in contents[0]
+    assert 'unchecked: This is my instance.' not in contents[0]
+
+
+
+def test_add_shared_domain():
+    user_request = searxinstances.update.UserRequestAdd(None, None, None, 'https://searx.eu.org', '')
+    with pytest.raises(ValueError, match='eu.org is a shared domain'):
+        user_request.execute(searxinstances.model.InstanceList(),
+                             searxinstances.model.yaml_load('https://searx.eu.org: {}\n'))
+    instance_list = searxinstances.model.InstanceList()
+    user_request.execute(instance_list, searxinstances.model.yaml_load('https://searx.org: {}\n'))
+    assert list(instance_list.keys()) == ['https://searx.org']
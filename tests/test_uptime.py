@@ -0,0 +1,117 @@
+import datetime
+import json
+
+import pytest
+
+from searxinstances import model, uptime
+
+
+END_DAY = uptime.get_day('2024-06-30T12:00:00Z')
+
+
+@pytest.mark.parametrize('value,expected', [
+    (0, 0),
+    (86399, 0),
+    (86400, 1),
+    ('1970-01-02T23:59:59Z', 1),
+    ('1970-01-03T01:00:00+02:00', 1),
+    (datetime.date(1970, 1, 3), 2),
+    ('86400', 1),
+])
+def test_get_day(value, expected):
+    assert uptime.get_day(value) == expected
+
+
+@pytest.mark.parametrize('url_or_host,expected', [
+    ('https://Searx.Example.com/', 'https://searx.example.com'),
+    ('https://searx.example.com/searxng/', 'https://searx.example.com/searxng'),
+    ('searx.example.com', 'https://searx.example.com'),
+    ('searxexample.onion', 'http://searxexample.onion'),
+    ('https://探す.com', 'https://xn--88j075m.com'),
+])
+def test_get_url(url_or_host, expected):
+    assert uptime.get_url(url_or_host) == expected
+
+
+@pytest.mark.parametrize('status,expected', [
+    ('up', True), ('degraded', True), ('down', False), (True, True), (0, False), (1, True), ('200', True), (502, False)
+])
+def test_is_up(status, expected):
+    assert uptime.is_up(status) == expected
+
+
+def test_get_uptime():
+    aggregator = uptime.UptimeAggregator()
+    for age in range(40):
+        time = (END_DAY - age) * 86400
+        for hour in range(24):
+            # down 2 hours a day for the last 7 days, down all day 20 days ago
+            up = not (age < 7 and hour < 2) and age != 20
+            aggregator.add('https://searx.example.com', time + hour * 3600, 'up' if up else 'down')
+    result = aggregator.get_uptime('https://searx.example.com')
+    assert result[7] == pytest.approx(22 / 24)
+    assert result[14] == pytest.approx((7 * 22 + 7 * 24) / (14 * 24))
+    assert result[30] == pytest.approx((7 * 22 + 22 * 24) / (30 * 24))
+    assert aggregator.get_uptime('https://unknown.example.com') == {7: None, 14: None, 30: None}
+
+
+def test_files(tmp_path):
+    csv_filename = tmp_path / 'a.csv'
+    csv_filename.write_text('url,time,status\n'
+                            'https://a.example.com,2024-06-30T00:00:00Z,up\n'
+                            'https://a.example.com,2024-06-30T01:00:00Z,down\n', encoding='utf-8')
+    json_filename = tmp_path / 'b.json'
+    json_filename.write_text(json.dumps({
+        'http://bexample.onion': [{'time': '2024-06-30T00:00:00Z', 'status': 'up'}],
+    }), encoding='utf-8')
+    yaml_filename = tmp_path / 'c.yml'
+    yaml_filename.write_text('- url: c.example.com\n  time: 2024-06-29T00:00:00Z\n  status: 200\n', encoding='utf-8')
+
+    aggregator = uptime.UptimeAggregator()
+    for filename in (csv_filename, json_filename, yaml_filename):
+        aggregator.add_file(str(filename))
+    instance_list = model.yaml_load('''https://a.example.com: {}
+https://b.example.com:
+  additional_urls:
+    http://bexample.onion: Hidden Service
+https://c.example.com: {}
+https://d.example.com: {}
+''')
+    result = {
+        instance_uptime.url: instance_uptime
+        for instance_uptime in uptime.get_instance_uptime_list(instance_list, aggregator)
+    }
+    assert result['https://a.example.com'].uptime[30] == 0.5
+    assert len(result['https://a.example.com'].violations) == 2
+    assert result['https://b.example.com'].uptime[7] == 1.0
+    assert result['https://c.example.com'].uptime[7] == 1.0
+    assert result['https://d.example.com'].uptime == {7: None, 14: None, 30: None}
+    assert result['https://d.example.com'].violations == []
+
+
+def test_same_host():
+    aggregator = uptime.UptimeAggregator()
+    aggregator.add('https://example.com/searx/', '2024-06-30T00:00:00Z', 'up')
+    aggregator.add('https://example.com/searxng', '2024-06-30T00:00:00+00:00', 'down')
+    aggregator.add('https://example.com/searxng', '2024-06-30T01:00:00+02:00', 'down')
+    instance_list = model.yaml_load('https://example.com/searx: {}\nhttps://example.com/searxng: {}\n')
+    result = uptime.get_instance_uptime_list(instance_list, aggregator, END_DAY)
+    assert [instance_uptime.uptime[7] for instance_uptime in result] == [1.0, 0.0]
+    assert aggregator.days['https://example.com/searxng'] == {END_DAY: [0, 1], END_DAY - 1: [0, 1]}
+
+
+def test_get_day_milliseconds():
+    with pytest.raises(ValueError, match='milliseconds'):
+        uptime.get_day(1719705600000)
+
+
+@pytest.mark.parametrize('content,message', [
+    ('time,status\n2024-06-30T00:00:00Z,up\n', 'has no url'),
+    ('url,time,status\nhttps://a.example.com,1719705600000,up\n', 'milliseconds'),
+])
+def test_invalid_file(tmp_path, content, message):
+    filename = tmp_path / 'a.csv'
+    filename.write_text(content, encoding='utf-8')
+    with pytest.raises(ValueError, match=message) as exc_info:
+        uptime.UptimeAggregator().add_file(str(filename))
+    assert str(exc_info.value).startswith(f'{filename}: ')
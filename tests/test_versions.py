@@ -0,0 +1,91 @@
+import datetime
+
+import git
+import httpx
+import pytest
+
+from searxinstances import model, versions
+
+
+DAY = datetime.timedelta(days=1)
+START = datetime.datetime(2024, 6, 1, tzinfo=datetime.timezone.utc)
+
+
+def add_commit(repo, index):
+    date = f'{int((START + index * DAY).timestamp())} +0000'
+    return repo.index.commit(f'commit {index}', author_date=date, commit_date=date).hexsha
+
+
+@pytest.fixture
+def searxng_repo(tmp_path):
+    repo = git.Repo.init(tmp_path / 'searxng')
+    with repo.config_writer() as config:
+        config.set_value('user', 'name', 'test')
+        config.set_value('user', 'email', 'test@example.com')
+    shas = [add_commit(repo, index) for index in range(10)]
+    return repo, shas
+
+
+def test_commit_graph_cache(searxng_repo, tmp_path):
+    repo, shas = searxng_repo
+    cache_filename = str(tmp_path / 'cache' / 'commit-graph.json')
+    commit_graph = versions.CommitGraph.load(repo.working_tree_dir, cache_filename)
+    assert commit_graph.get_distance(shas[0]) == (9, 9.0)
+    assert commit_graph.find(shas[3][:9]) == shas[3]
+    assert commit_graph.find('0000000') is None
+
+    # new commits are added to the cache
+    shas += [add_commit(repo, index) for index in range(10, 12)]
+    commit_graph = versions.CommitGraph.load(repo.working_tree_dir, cache_filename)
+    assert commit_graph.head == shas[-1]
+    assert commit_graph.get_distance(shas[0]) == (11, 11.0)
+    assert commit_graph.get_distance(shas[-1]) == (0, 0.0)
+
+
+def test_commit_graph_merge(tmp_path):
+    # c0 - a1 - a2 - a3 - merge
+    #   \                /
+    #    b1 ------------
+    repo = git.Repo.init(tmp_path / 'searxng')
+    c0 = repo.index.commit('c0')
+    a3 = c0
+    for name in ['a1', 'a2', 'a3']:
+        a3 = repo.index.commit(name, parent_commits=[a3])
+    b1 = repo.index.commit('b1', parent_commits=[c0])
+    repo.index.commit('merge', parent_commits=[b1, a3])
+    commit_graph = versions.CommitGraph.load(repo.working_tree_dir, None)
+    assert commit_graph.count_commits_behind(b1.hexsha) == 4
+    assert commit_graph.count_commits_behind(a3.hexsha) == 2
+    assert commit_graph.count_commits_behind(c0.hexsha) == 5
+    assert commit_graph.count_commits_behind(commit_graph.head) == 0
+    assert commit_graph.count_commits_behind(c0.hexsha) == int(repo.git.rev_list('--count', f'{c0.hexsha}..HEAD'))
+
+
+@pytest.mark.asyncio
+async def test_check_instance_list(searxng_repo):
+    repo, shas = searxng_repo
+    commit_graph = versions.CommitGraph.load(repo.working_tree_dir, None)
+    instance_versions = {
+        'up-to-date.example.com': f'2024.6.10+{shas[9][:9]}',
+        'late.example.com': f'2024.6.1+{shas[0][:9]}',
+        'fork.example.com': '2024.6.1+0000000',
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.host not in instance_versions:
+            return httpx.Response(502)
+        assert request.url.path == '/config'
+        return httpx.Response(200, json={'version': instance_versions[request.url.host]})
+
+    instance_list = model.InstanceList()
+    for host in ['up-to-date.example.com', 'late.example.com', 'fork.example.com', 'down.example.com']:
+        instance_list['https://' + host] = model.Instance()
+    report = await versions.check_instance_list(instance_list, commit_graph, transport=httpx.MockTransport(handler))
+    assert [(result.url, result.commits_behind) for result in report] == [
+        ('https://late.example.com', 9),
+        ('https://up-to-date.example.com', 0),
+        ('https://down.example.com', None),
+        ('https://fork.example.com', None),
+    ]
+    assert report[0].days_behind == 9.0
+    assert report[3].error == 'commit 0000000 not found'